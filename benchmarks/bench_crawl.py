@@ -0,0 +1,148 @@
+""" End to end crawl benchmark against a local synthetic website.
+
+Starts the synthetic site server in a separate process, runs check_website_health against it and reports pages/s,
+links/s, the peak memory and the time spent per stage. Run it from the root of the project:
+
+    python -m benchmarks.bench_crawl --pages 200 --links-per-page 50 --concurrency 32 --per-host-concurrency 8
+
+Use --output to append the results as a JSON line to a file to track them over time.
+"""
+
+from typing import Tuple
+
+import argparse
+import json
+import multiprocessing
+import resource
+import socket
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.synthetic_site import SiteSpec, serve
+from src.health_checker import WebsiteHealthChecker
+
+
+STAGES = ["sitemap", "fetch", "parse", "check", "report"]
+
+
+def find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb() -> Tuple[float, float]:
+    """ Peak resident memory of this process and of the finished parser processes (ru_maxrss is in KiB on Linux). """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return own / divisor, children / divisor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a full crawl against a local synthetic website")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--links-per-page", type=int, default=50)
+    parser.add_argument("--unique-links", type=int, default=2000)
+    parser.add_argument("--broken-fraction", type=float, default=0.05)
+    parser.add_argument("--redirect-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-fraction", type=float, default=0.01)
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    parser.add_argument("--external-hosts", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--per-host-concurrency", type=int, default=8)
+    parser.add_argument("--parser-workers", type=int, default=1)
+    parser.add_argument("--host-rate-limit", type=float, default=1000, help="Requests per second per host, high by default to measure the engine and not the politeness")
+    parser.add_argument("--output", type=str, help="Append the results as a JSON line to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the log output of the crawl")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    spec = SiteSpec(
+        pages=args.pages,
+        links_per_page=args.links_per_page,
+        unique_links=args.unique_links,
+        broken_fraction=args.broken_fraction,
+        redirect_fraction=args.redirect_fraction,
+        slow_fraction=args.slow_fraction,
+        slow_delay=args.slow_delay,
+        external_hosts=args.external_hosts
+    )
+    port = find_free_port()
+
+    # the server runs in its own process so that it does not compete with the crawl for the GIL
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    stop = context.Event()
+    server = context.Process(target=serve, args=(spec, port, ready, stop), daemon=True)
+    server.start()
+    ready.wait(timeout=30)
+
+    with tempfile.TemporaryDirectory() as temporary_path:
+        config = {
+            "host_rate_limit": args.host_rate_limit,
+            "cache_path": str(Path(temporary_path).joinpath("link_cache.sqlite3")),
+        }
+
+        health_checker = WebsiteHealthChecker(
+            f"http://127.0.0.1:{port}",
+            concurrency=args.concurrency,
+            per_host_concurrency=args.per_host_concurrency,
+            parser_workers=args.parser_workers,
+            config=config
+        )
+        health_checker.report_printer.output_path = Path(temporary_path).joinpath("reports")
+
+        start = time.perf_counter()
+        health_checker.check_website_health()
+        duration = time.perf_counter() - start
+
+    # measured before the server process is stopped, so that only the parser processes count as children
+    own_rss, children_rss = peak_rss_mb()
+
+    stop.set()
+    server.join(timeout=5)
+
+    registry = health_checker.link_registry
+    checked_links = len(registry)
+
+    results = {
+        "spec": asdict(spec),
+        "concurrency": args.concurrency,
+        "per_host_concurrency": args.per_host_concurrency,
+        "parser_workers": args.parser_workers,
+        "duration_s": round(duration, 3),
+        "pages_per_s": round(args.pages / duration, 2),
+        "links_per_s": round(checked_links / duration, 2),
+        "checked_links": checked_links,
+        "broken_links": len(registry.broken_links),
+        "redirected_links": len(registry.redirected_links),
+        "peak_rss_mb": round(own_rss, 1),
+        "peak_rss_parser_mb": round(children_rss, 1),
+        "stage_seconds": {stage: round(health_checker.stage_timer.durations.get(stage, 0), 3) for stage in STAGES},
+    }
+
+    print(f"Duration:      {results['duration_s']:.2f} s")
+    print(f"Pages/s:       {results['pages_per_s']:.1f}")
+    print(f"Links/s:       {results['links_per_s']:.1f} ({checked_links} unique links, {results['broken_links']} broken, {results['redirected_links']} redirected)")
+    print(f"Peak RSS:      {results['peak_rss_mb']:.1f} MB (parser processes {results['peak_rss_parser_mb']:.1f} MB)")
+    print("Stage time (summed over concurrent tasks):")
+
+    for stage in STAGES:
+        print(f"  {stage:<8} {results['stage_seconds'][stage]:8.2f} s")
+
+    if args.output:
+        with open(args.output, "a") as file:
+            file.write(json.dumps(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
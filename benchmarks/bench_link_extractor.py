@@ -0,0 +1,82 @@
+""" Micro-benchmark comparing the single pass lxml link extractor with the former BeautifulSoup based extraction.
+
+Run it from the root of the project:
+
+    python -m benchmarks.bench_link_extractor --links 5000 --repeat 5
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from src.link_extractor import extract_links_in_page, extract_page_links, extract_resources_in_page
+
+
+def create_page(links: int) -> bytes:
+    """ Creates a large html page with the given number of links, scripts, images and stylesheets mixed with text. """
+    random.seed(links)
+    parts = ["<html><head><title>Benchmark</title>"]
+
+    for index in range(links // 50):
+        parts.append(f'<link rel="stylesheet" href="/static/style-{index}.css"><script src="/static/app-{index}.js"></script>')
+
+    parts.append("</head><body>")
+
+    for index in range(links):
+        kind = random.random()
+
+        if kind < 0.7:
+            parts.append(f'<p>Lorem ipsum dolor sit amet <a href="/page-{index}/" class="link">page {index}</a> consectetur.</p>')
+        elif kind < 0.9:
+            parts.append(f'<div class="card"><img src="/images/{index}.png" alt="image {index}"></div>')
+        else:
+            parts.append(f'<a href="https://external-{index % 20}.example.com/{index}">external</a>')
+
+    parts.append("</body></html>")
+    return "".join(parts).encode()
+
+
+def run_beautifulsoup(page: bytes) -> int:
+    soup = BeautifulSoup(page, features="html.parser")
+    links = extract_links_in_page(soup)
+    scripts, images, other_links = extract_resources_in_page(soup)
+    return len(links) + len(scripts) + len(images) + len(other_links)
+
+
+def run_single_pass(page: bytes) -> int:
+    return len(extract_page_links(page))
+
+
+def measure(func, page: bytes, repeat: int):
+    durations = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = func(page)
+        durations.append(time.perf_counter() - start)
+
+    return statistics.median(durations), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the link extraction engines on a large synthetic page")
+    parser.add_argument("--links", type=int, default=5000, help="The number of links on the page")
+    parser.add_argument("--repeat", type=int, default=5, help="How often each engine is run, the median is reported")
+    args = parser.parse_args()
+
+    page = create_page(args.links)
+    print(f"Page size: {len(page) / 1024:.0f} KiB")
+
+    beautifulsoup_time, beautifulsoup_found = measure(run_beautifulsoup, page, args.repeat)
+    single_pass_time, single_pass_found = measure(run_single_pass, page, args.repeat)
+
+    print(f"BeautifulSoup (html.parser, 4 scans): {beautifulsoup_time * 1000:8.1f} ms, {beautifulsoup_found} links")
+    print(f"Single pass (lxml target parser):     {single_pass_time * 1000:8.1f} ms, {single_pass_found} links")
+    print(f"Speedup: {beautifulsoup_time / single_pass_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+""" Memory benchmark of the link registry on a large simulated crawl.
+
+Every page links a set of footer links that appear on all pages, a number of other pages and a few external links.
+Reports the number of records, the time to register all links and the peak memory. Run it from the root of the project:
+
+    python -m benchmarks.bench_link_registry --pages 50000
+"""
+
+import argparse
+import random
+import resource
+import sys
+import time
+
+from src.data_objects import LinkCategory, LinkRecord, LinkType
+from src.link_registry import LinkRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory of the link registry on a simulated crawl")
+    parser.add_argument("--pages", type=int, default=50000)
+    parser.add_argument("--footer-links", type=int, default=40, help="Links found on every page")
+    parser.add_argument("--page-links", type=int, default=20, help="Links to random other pages per page")
+    parser.add_argument("--external-links", type=int, default=5, help="Links to random external urls per page")
+    args = parser.parse_args()
+
+    randomizer = random.Random(42)
+    footer_links = [f"https://www.example.com/footer-{index}/" for index in range(args.footer_links)]
+    registry = LinkRegistry()
+
+    start = time.perf_counter()
+
+    for page_index in range(args.pages):
+        page = f"https://www.example.com/page-{page_index}/"
+
+        links = footer_links + [f"https://www.example.com/page-{randomizer.randrange(args.pages)}/" for _ in range(args.page_links)]
+        links += [f"https://external-{randomizer.randrange(50)}.example.org/{randomizer.randrange(100000)}" for _ in range(args.external_links)]
+
+        for link in links:
+            if not registry.add_found_in(link, page):
+                registry.add(LinkRecord(link=link, resource_type=LinkType.LINK), LinkCategory.PENDING, found_in=page)
+
+    duration = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    references = sum(len(registry.pages.urls_of(record)) for category in LinkCategory for record in registry.records(category))
+
+    print(f"Records:    {len(registry)} ({references} page references, {len(registry.pages)} pages)")
+    print(f"Duration:   {duration:.2f} s")
+    print(f"Peak RSS:   {peak_rss:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
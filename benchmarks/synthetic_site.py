@@ -0,0 +1,179 @@
+""" A local stand-in web server that serves a synthetic website for reproducible crawl benchmarks.
+
+The website is fully determined by a SiteSpec: a sitemap with a number of pages, each page holding a number of links.
+Links point to other pages, to resources on the main host or to external hosts. A configurable fraction of the links
+is broken (404), redirects (301) or answers slowly. External hosts are virtual hosts on further loopback addresses
+(127.0.0.2, 127.0.0.3, ...). Each address gets a server of its own, all of them serve the same website with the
+same handler regardless of the Host header.
+"""
+
+from typing import List
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class SiteSpec:
+    pages: int = 200
+    links_per_page: int = 50
+    # number of distinct link targets that are not pages, shared between all pages
+    unique_links: int = 2000
+    broken_fraction: float = 0.05
+    redirect_fraction: float = 0.05
+    slow_fraction: float = 0.01
+    # seconds a slow link takes to answer
+    slow_delay: float = 0.5
+    external_hosts: int = 5
+    seed: int = 42
+
+    @property
+    def main_address(self) -> str:
+        return "127.0.0.1"
+
+    def external_address(self, index: int) -> str:
+        return f"127.0.0.{index + 2}"
+
+    @property
+    def addresses(self) -> List[str]:
+        return [self.main_address] + [self.external_address(index) for index in range(self.external_hosts)]
+
+
+class SyntheticSite:
+    """ Generates the content of the synthetic website. Every response is derived from the spec only. """
+
+    def __init__(self, spec: SiteSpec, port: int):
+        self.spec = spec
+        self.port = port
+
+        # the kind of each link target is decided once, so every run of the benchmark checks the same website
+        randomizer = random.Random(spec.seed)
+        self.link_kinds = []
+
+        for _ in range(spec.unique_links):
+            value = randomizer.random()
+
+            if value < spec.broken_fraction:
+                self.link_kinds.append("broken")
+            elif value < spec.broken_fraction + spec.redirect_fraction:
+                self.link_kinds.append("redirect")
+            elif value < spec.broken_fraction + spec.redirect_fraction + spec.slow_fraction:
+                self.link_kinds.append("slow")
+            else:
+                self.link_kinds.append("ok")
+
+    @property
+    def main_url(self) -> str:
+        return f"http://{self.spec.main_address}:{self.port}"
+
+    def link_url(self, link_id: int) -> str:
+        """ Links are spread over the main host and the external hosts. """
+        host_index = link_id % (self.spec.external_hosts + 1)
+        address = self.spec.main_address if host_index == 0 else self.spec.external_address(host_index - 1)
+        return f"http://{address}:{self.port}/r/{self.link_kinds[link_id]}/{link_id}"
+
+    def sitemap(self) -> bytes:
+        urls = "".join(f"<url><loc>{self.main_url}/page-{index}/</loc></url>" for index in range(self.spec.pages))
+        return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode()
+
+    def page(self, index: int) -> bytes:
+        randomizer = random.Random(self.spec.seed * 1000003 + index)
+        parts = [f"<html><head><title>Page {index}</title><link rel=\"stylesheet\" href=\"/static/style.css\"></head><body>"]
+
+        for _ in range(self.spec.links_per_page):
+            if randomizer.random() < 0.3:
+                parts.append(f'<p>Text <a href="/page-{randomizer.randrange(self.spec.pages)}/">page</a></p>')
+            else:
+                link_url = self.link_url(randomizer.randrange(self.spec.unique_links))
+
+                if randomizer.random() < 0.2:
+                    parts.append(f'<img src="{link_url}" alt="image">')
+                else:
+                    parts.append(f'<p>Text <a href="{link_url}">link</a></p>')
+
+        parts.append('<script src="/static/app.js"></script></body></html>')
+        return "".join(parts).encode()
+
+
+class SyntheticSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # keep the benchmark output clean
+        pass
+
+    @property
+    def site(self) -> SyntheticSite:
+        return self.server.site
+
+    def _send(self, status_code: int, body: bytes = b"", content_type: str = "text/html", headers: dict = None):
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+
+        self.end_headers()
+
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        parts = path.strip("/").split("/")
+
+        if path == "/sitemap.xml":
+            return self._send(200, self.site.sitemap(), "application/xml")
+
+        if path == "/" or path.startswith("/static/"):
+            return self._send(200, b"<html><body>ok</body></html>")
+
+        if parts[0].startswith("page-") and parts[0][5:].isdigit() and int(parts[0][5:]) < self.site.spec.pages:
+            return self._send(200, self.site.page(int(parts[0][5:])))
+
+        if len(parts) == 3 and parts[0] == "r":
+            kind = parts[1]
+
+            if kind == "broken":
+                return self._send(404, b"not found")
+
+            if kind == "redirect":
+                return self._send(301, headers={"Location": f"/r/ok/{parts[2]}"})
+
+            if kind == "slow":
+                time.sleep(self.site.spec.slow_delay)
+
+            return self._send(200, b"x" * 512, "application/octet-stream")
+
+        return self._send(404, b"not found")
+
+
+def serve(spec: SiteSpec, port: int, ready: threading.Event = None, stop: threading.Event = None):
+    """ Serves the synthetic site on all addresses of the spec until stop is set (or forever). """
+    site = SyntheticSite(spec, port)
+    servers = []
+
+    for address in spec.addresses:
+        server = ThreadingHTTPServer((address, port), SyntheticSiteHandler)
+        server.daemon_threads = True
+        server.site = site
+        servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    if ready is not None:
+        ready.set()
+
+    try:
+        while stop is None or not stop.is_set():
+            time.sleep(0.1)
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
@@ -1,14 +1,38 @@
 
 import argparse
+from pathlib import Path
 
+from src.batch import BatchHealthChecker, read_sites
 from src.health_checker import WebsiteHealthChecker
+from src.metrics import profile_run
 
 def main():
     parser = argparse.ArgumentParser(description='Check a website health status including broken links and missing resources!')
 
-    parser.add_argument('url', type=str, help='The URL of the website to check')
+    parser.add_argument('url', type=str, nargs='?', help='The URL of the website to check')
+    parser.add_argument('--batch', type=str, help='A JSON lines file of websites to check concurrently instead of a single URL')
+    parser.add_argument('--sites-concurrency', type=int, default=4, help='The maximum number of websites of a batch checked at the same time')
+    parser.add_argument('--concurrency', type=int, default=1, help='The maximum number of link checks running in parallel')
+    parser.add_argument('--per-host-concurrency', type=int, default=1, help='The maximum number of parallel link checks against the same host')
+    parser.add_argument('--parser-workers', type=int, default=1, help='The number of processes parsing the fetched pages')
+    parser.add_argument('--resume', action='store_true', help='Continue the last crawl of the website from its checkpoint if it did not finish')
+    parser.add_argument('--discover', action='store_true', help='Also crawl the internal pages linked from the crawled pages, not only the sitemap pages')
+    parser.add_argument('--incremental', action='store_true', help='Reuse the links of the sitemap pages whose lastmod did not change and report the changes since the last run')
+    parser.add_argument('--profile', action='store_true', help='Profile the run with cProfile and write the stats to the reports folder')
     args = parser.parse_args()
 
+    if args.batch:
+        batch_checker = BatchHealthChecker(read_sites(Path(args.batch)), sites_concurrency=args.sites_concurrency, concurrency=args.concurrency,
+                                           per_host_concurrency=args.per_host_concurrency, parser_workers=args.parser_workers, resume=args.resume,
+                                           discover=args.discover, incremental=args.incremental)
+
+        if args.profile:
+            profile_run(batch_checker.check_websites_health, batch_checker.output_path.joinpath("health_check_profile.pstats"))
+        else:
+            batch_checker.check_websites_health()
+
+        return
+
     if not args.url:
         print('Please provide a URL to check the website health status!')
         return
@@ -19,9 +43,13 @@ def main():
         if "http" not in url:
             url = "https://" + url
 
-        health_checker = WebsiteHealthChecker(url)
+        health_checker = WebsiteHealthChecker(url, concurrency=args.concurrency, per_host_concurrency=args.per_host_concurrency, parser_workers=args.parser_workers, resume=args.resume,
+                                              discover=args.discover, incremental=args.incremental)
 
-        health_checker.check_website_health()
+        if args.profile:
+            profile_run(health_checker.check_website_health, health_checker.report_printer.output_path.joinpath("health_check_profile.pstats"))
+        else:
+            health_checker.check_website_health()
 
 if __name__ == '__main__':
     main()
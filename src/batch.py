@@ -0,0 +1,157 @@
+""" This module holds the batch mode. It checks the websites listed in a JSON lines file concurrently in one process.
+All websites share the worker threads, the parser processes, the pooled http client, the link cache, the rate limiter,
+the circuit breaker and the results of links on other hosts, so that e.g. a social media or CDN url linked by many
+websites is only checked once per batch. Each website still gets its own report in reports/<host>/. """
+
+from typing import List
+
+import asyncio
+import json
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from src.data_objects import LinkCategory
+from src.health_checker import ROOT_PATH, WebsiteHealthChecker, create_circuit_breaker, create_http_client, create_link_cache, \
+    create_page_store, create_rate_limiter, load_config
+from src.link_registry import SharedLinkResults
+from src.metrics import CrawlMetrics
+
+
+@dataclass
+class BatchSite:
+    """ A website of a batch, e.g. {"url": "https://www.example.com", "config": {"valid_email_addresses": [...]}} """
+    url: str
+    # config keys overriding the config.json for this website
+    config: dict = field(default_factory=dict)
+
+
+def read_sites(path: Path) -> List[BatchSite]:
+    """ Reads the websites of a batch from a JSON lines file, one website per line. Empty lines are skipped. """
+    sites = []
+
+    with open(path, "r") as file:
+        for line in file:
+            if not line.strip():
+                continue
+
+            entry = json.loads(line)
+            url = entry["url"]
+
+            if "http" not in url:
+                url = "https://" + url
+
+            sites.append(BatchSite(url=url, config=entry.get("config", {})))
+
+    return sites
+
+
+class BatchHealthChecker:
+    """ Checks the health of several websites concurrently.
+    :param sites: list - the websites to check
+    :param sites_concurrency: int - the maximum number of websites checked at the same time
+    :param config: dict - the base config of all websites, defaults to the config.json file
+
+    The other parameters apply to each website, see WebsiteHealthChecker. Settings of the shared components
+    (http pool, DNS cache, link cache, page store, rate limits and circuit breaker) are taken from the base config only.
+    """
+
+    def __init__(self, sites: List[BatchSite], sites_concurrency=4, concurrency=1, per_host_concurrency=1, parser_workers=1, resume=False,
+                 config: dict = None, discover=False, incremental=False):
+        self.sites_concurrency = max(1, sites_concurrency)
+        self.parser_workers = max(1, parser_workers)
+
+        self.config = config if config is not None else load_config(ROOT_PATH.joinpath("config.json"))
+        self.output_path = ROOT_PATH.joinpath("reports")
+
+        # request metrics of all websites, the stage times are recorded per website
+        self.metrics = CrawlMetrics()
+
+        self.http_client = create_http_client(self.config, per_host_concurrency, self.metrics)
+        self.link_cache = create_link_cache(self.config)
+        self.page_store = create_page_store(self.config) if incremental else None
+        self.rate_limiter = create_rate_limiter(self.config)
+        self.circuit_breaker = create_circuit_breaker(self.config)
+        self.shared_results = SharedLinkResults()
+
+        self.health_checkers = [
+            WebsiteHealthChecker(
+                site.url,
+                concurrency=concurrency,
+                per_host_concurrency=per_host_concurrency,
+                parser_workers=parser_workers,
+                config=self._site_config(site),
+                resume=resume,
+                discover=discover,
+                incremental=incremental,
+                http_client=self.http_client,
+                link_cache=self.link_cache,
+                page_store=self.page_store,
+                rate_limiter=self.rate_limiter,
+                circuit_breaker=self.circuit_breaker,
+                shared_results=self.shared_results
+            )
+            for site in sites
+        ]
+
+        for health_checker in self.health_checkers:
+            health_checker.report_printer.output_path = self.output_path.joinpath(health_checker.site_name)
+
+            if health_checker.metrics_path:
+                health_checker.metrics_path = Path(health_checker.metrics_path).joinpath(health_checker.site_name)
+
+    def _site_config(self, site: BatchSite) -> dict:
+        # a checkpoint file of the base config would be shared by all websites, each website uses its own default instead
+        config = {key: value for key, value in self.config.items() if key != "checkpoint_path"}
+        config.update(site.config)
+        return config
+
+    def check_websites_health(self):
+        try:
+            asyncio.run(self._check_websites_health())
+        finally:
+            for health_checker in self.health_checkers:
+                health_checker.checkpoint.close()
+
+            self.link_cache.close()
+            self.http_client.close()
+
+            if self.page_store is not None:
+                self.page_store.close()
+
+    async def _check_websites_health(self):
+        loop = asyncio.get_running_loop()
+        site_slots = asyncio.Semaphore(self.sites_concurrency)
+        worker_threads = self.sites_concurrency * max((health_checker.worker_threads for health_checker in self.health_checkers), default=1)
+
+        with ThreadPoolExecutor(max_workers=worker_threads) as executor, \
+                ProcessPoolExecutor(max_workers=self.parser_workers, mp_context=multiprocessing.get_context("spawn")) as parser_pool:
+
+            async def check(health_checker: WebsiteHealthChecker):
+                async with site_slots:
+                    logger.info(f"Starting health check of {health_checker.main_url}")
+
+                    try:
+                        if await health_checker.crawl(executor, parser_pool):
+                            # the report is written in a worker thread, so that the other websites keep running
+                            await loop.run_in_executor(executor, health_checker.write_report)
+
+                    except Exception as e:
+                        # a failing website does not stop the batch, its checkpoint is kept for --resume
+                        logger.error(f"Health check of {health_checker.main_url} failed: {e}")
+
+            await asyncio.gather(*[check(health_checker) for health_checker in self.health_checkers])
+
+        self.http_client.log_statistics()
+        logger.info(f"Checked {len(self.health_checkers)} websites, {len(self.shared_results)} links on other hosts were checked once for all of them")
+
+        link_counts = Counter()
+
+        for health_checker in self.health_checkers:
+            link_counts.update({category.value: len(health_checker.link_registry.records(category)) for category in LinkCategory})
+
+        self.metrics.export(self.output_path, link_counts=dict(link_counts))
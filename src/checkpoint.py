@@ -0,0 +1,123 @@
+""" This module holds the crawl checkpoint. The state of a running crawl is appended to a JSON lines file, so that a
+crawl which died halfway can be resumed with --resume instead of starting over. Only two kinds of events are written:
+a processed page with the links and anchors found on it, and the final result of a checked link. Replaying the pages
+rebuilds all records, links without a result are the ones that were still pending and are checked again. """
+
+from typing import Dict, List, Optional, Tuple
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from src.data_objects import LinkCategory, LinkType
+
+
+@dataclass
+class CheckpointState:
+    """ The crawl state read from a checkpoint file. """
+    # page url -> status code of the page, the links found on it, its anchors and its crawl depth (0 for sitemap pages)
+    pages: Dict[str, Tuple[int, List[Tuple[str, LinkType]], List[str], int]] = field(default_factory=dict)
+    # canonical link url -> status code and category of the finished check
+    results: Dict[str, Tuple[int, LinkCategory]] = field(default_factory=dict)
+
+
+class CrawlCheckpoint:
+    """ Append-only checkpoint file of a crawl. Events are buffered in memory and written by flush(),
+    which the health checker calls every checkpoint_interval seconds and at the end of a run.
+    :param path: Path - the checkpoint file, its folder is created if needed
+    :param main_url: str - the crawled website, a checkpoint of another website is never resumed
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: Path, main_url: str):
+        self.path = path
+        self.main_url = main_url
+
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._file = None
+
+    def load(self) -> Optional[CheckpointState]:
+        """ Reads the checkpoint file. Returns None if there is no usable checkpoint of the main url. """
+        if not self.path.exists():
+            return None
+
+        state = CheckpointState()
+
+        with open(self.path, "r") as file:
+            try:
+                header = json.loads(file.readline())
+            except json.JSONDecodeError:
+                header = {}
+
+            if header.get("version") != self.VERSION or header.get("url") != self.main_url:
+                logger.warning(f"The checkpoint {self.path} does not belong to {self.main_url} and is not resumed")
+                return None
+
+            for line in file:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be incomplete if the crawl was killed while writing it
+                    continue
+
+                if "p" in event:
+                    links = [(link, LinkType(link_type)) for link, link_type in event["l"]]
+                    state.pages[event["p"]] = (event["s"], links, event.get("a", []), event.get("d", 0))
+                else:
+                    state.results[event["r"]] = (event["s"], LinkCategory(event["c"]))
+
+        return state
+
+    def open(self, resume: bool):
+        """ Opens the checkpoint file for appending. Without resume a previous checkpoint is overwritten. """
+        if not self.path.parent.exists():
+            self.path.parent.mkdir(parents=True)
+
+        if resume and self.path.exists():
+            self._file = open(self.path, "a")
+            return
+
+        self._file = open(self.path, "w")
+        self._file.write(json.dumps({"version": self.VERSION, "url": self.main_url}) + "\n")
+        self._file.flush()
+
+    def add_page(self, url: str, status_code: int, links: List[Tuple[str, LinkType]], anchors: List[str] = (), depth: int = 0):
+        event = {"p": url, "s": int(status_code), "l": [(link, link_type.value) for link, link_type in links], "a": list(anchors), "d": depth}
+
+        with self._lock:
+            self._buffer.append(json.dumps(event, separators=(",", ":")))
+
+    def add_result(self, url: str, status_code: int, category: LinkCategory):
+        event = {"r": url, "s": int(status_code), "c": category.value}
+
+        with self._lock:
+            self._buffer.append(json.dumps(event, separators=(",", ":")))
+
+    def flush(self):
+        """ Appends the buffered events to the file and forces them to disk. """
+        with self._lock:
+            if not self._buffer or self._file is None:
+                return
+
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self, remove: bool = False):
+        """ Flushes and closes the file. A finished crawl removes its checkpoint, there is nothing left to resume. """
+        self.flush()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if remove and self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,101 @@
+""" This module holds the per host circuit breaker. A host that fails several connection attempts in a row is considered
+down: the remaining links to it are reported as HOST-DOWN right away instead of each one waiting for its own timeout.
+After a while a single trial request is let through (half-open), if it gets a response the host is considered up again. """
+
+from typing import Dict
+
+import enum
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+
+class CircuitState(enum.Enum):
+    CLOSED = "closed"
+    """ the host is up, all requests are sent """
+    OPEN = "open"
+    """ the host is down, no requests are sent """
+    HALF_OPEN = "half-open"
+    """ the host was down, a single trial request decides whether it is up again """
+
+
+@dataclass
+class HostCircuit:
+    """ The circuit state of a single host with connection failures. """
+    state: CircuitState = CircuitState.CLOSED
+    # connection failures in a row
+    failures: int = 0
+    opened_at: float = 0
+    trial_running: bool = False
+
+
+class HostCircuitBreaker:
+    """ Circuit breaker with one circuit per host. Only hosts with connection failures are tracked.
+    :param failure_threshold: int - the number of connection failures in a row after which a host is considered down, 0 disables the breaker
+    :param reset_timeout: float - the number of seconds after which a trial request is sent to a host that is down
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.circuits: Dict[str, HostCircuit] = {}
+
+    def state(self, host: str) -> CircuitState:
+        circuit = self.circuits.get(host)
+        return circuit.state if circuit is not None else CircuitState.CLOSED
+
+    def allow(self, host: str) -> bool:
+        """ Returns whether a request may be sent to the host. A host that is down lets a single trial request
+        through once reset_timeout has passed.
+        """
+        circuit = self.circuits.get(host)
+
+        if circuit is None or circuit.state == CircuitState.CLOSED:
+            return True
+
+        if circuit.state == CircuitState.OPEN and time.monotonic() - circuit.opened_at >= self.reset_timeout:
+            circuit.state = CircuitState.HALF_OPEN
+            circuit.trial_running = False
+
+        if circuit.state == CircuitState.HALF_OPEN and not circuit.trial_running:
+            circuit.trial_running = True
+            logger.info(f"Host {host} was down for {self.reset_timeout} seconds, sending a trial request")
+            return True
+
+        return False
+
+    def record_success(self, host: str):
+        """ Closes the circuit of a host that answered a request, no matter with which status code. """
+        circuit = self.circuits.pop(host, None)
+
+        if circuit is not None and circuit.state != CircuitState.CLOSED:
+            logger.info(f"Host {host} is reachable again")
+
+    def record_failure(self, host: str):
+        """ Counts a connection failure (connection refused, DNS or TLS error, connect timeout) of a host. """
+        if not self.failure_threshold:
+            return
+
+        circuit = self.circuits.setdefault(host, HostCircuit())
+        circuit.failures += 1
+
+        if circuit.state == CircuitState.HALF_OPEN:
+            circuit.state = CircuitState.OPEN
+            circuit.opened_at = time.monotonic()
+            circuit.trial_running = False
+            logger.warning(f"Host {host} is still down, next trial request in {self.reset_timeout} seconds")
+
+        elif circuit.state == CircuitState.CLOSED and circuit.failures >= self.failure_threshold:
+            circuit.state = CircuitState.OPEN
+            circuit.opened_at = time.monotonic()
+            logger.warning(f"Host {host} failed {circuit.failures} connection attempts in a row, its links are reported as HOST-DOWN")
+
+    def release_trial(self, host: str):
+        """ Ends a trial request that got neither a response nor a connection failure, e.g. because its check was
+        cancelled, so that the next request to the host is sent as trial instead. """
+        circuit = self.circuits.get(host)
+
+        if circuit is not None and circuit.state == CircuitState.HALF_OPEN:
+            circuit.trial_running = False
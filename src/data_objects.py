@@ -1,8 +1,9 @@
 """ This file holds data objects and enums that used across the project. """
 
-from typing import List
+from typing import List, Optional, Tuple, Union
 
 import enum
+from array import array
 from dataclasses import dataclass
 
 class LinkType(enum.Enum):
@@ -12,11 +13,71 @@ class LinkType(enum.Enum):
     LINK = "Link"
     EMAIL = "Email"
     TELEPHONE = "Telephone"
+    MEDIA = "Media"
+    FRAME = "Frame"
 
-@dataclass
+class LinkStatus(enum.IntEnum):
+    """ Status codes of link records that are not http status codes. Http status codes are stored as plain ints,
+    the special codes are zero or negative so both fit into the same int field. """
+    # no request is sent for the link (email and telephone links) or its check has not finished yet
+    NONE = 0
+    # the link is skipped because it is listed in skip_check_urls
+    SKIP_URL = -1
+    # the link is skipped because it matches one of the skip_check_url_patterns
+    SKIP_PATTERN = -2
+    # the request failed without a response, e.g. a connection error
+    ERROR = -3
+    # the page exists but has no element with the id (or anchor name) of the fragment
+    MISSING_ANCHOR = -4
+    # the link is not requested because its host failed too many connection attempts in a row
+    HOST_DOWN = -5
+
+    @property
+    def label(self) -> str:
+        return "" if self is LinkStatus.NONE else self.name.replace("_", "-")
+
+def status_code_label(status_code: int) -> str:
+    """ Returns the http status code as string or the label of a special status, e.g. "SKIP-URL". """
+    return str(status_code) if status_code > 0 else LinkStatus(status_code).label
+
+class LinkCategory(enum.Enum):
+    """ The result category of a checked link. Pending links are scheduled but their check has not finished yet. """
+    WORKING = "working"
+    REDIRECTED = "redirected"
+    BROKEN = "broken"
+    # links to an existing page whose #fragment does not match any element of the page
+    MISSING_ANCHOR = "missing-anchor"
+    PENDING = "pending"
+
+@dataclass(slots=True)
 class LinkRecord:
-    """ This is the main data object holding information about a link found in a webpage. """
+    """ This is the main data object holding information about a link found in a webpage.
+    Large websites hold hundreds of thousands of records, so they are slotted and refer to pages by id (see PageIndex).
+    """
     link: str
     resource_type: LinkType
-    found_in_page: List[str]
-    status_code: int
+    # http status code or LinkStatus
+    status_code: int = LinkStatus.NONE
+    # the pages the link was found in: the id of the only page or an array of page ids, each page is listed once
+    found_in: Union[None, int, array] = None
+    # set by the LinkRegistry
+    category: LinkCategory = LinkCategory.PENDING
+    # seconds the request(s) of the link check took, None if no request was sent
+    response_time: Optional[float] = None
+
+@dataclass(slots=True)
+class ParsedPage:
+    """ The result of parsing a page: its links and the anchors (element ids and <a name>) fragment links can point to. """
+    links: List[Tuple[str, LinkType]]
+    anchors: List[str]
+
+@dataclass
+class SitemapEntry:
+    """ A single <url> or <sitemap> entry of a sitemap.xml file. """
+    loc: str
+    # True if the entry references another sitemap (<sitemap> in a sitemap index), False for a page (<url>)
+    is_sitemap: bool
+    # the <lastmod> date of the entry as written in the sitemap, e.g. 2024-05-01 or 2024-05-01T10:00:00+00:00
+    lastmod: Optional[str] = None
+    # set for a sitemap that could not be read: its http status code or LinkStatus.ERROR
+    status_code: Optional[int] = None
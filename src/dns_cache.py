@@ -0,0 +1,76 @@
+""" This module holds the DNS cache. urllib3 resolves the host of every new connection with socket.getaddrinfo, which asks
+the system resolver again each time. Most links of a website point to a few hosts, so the results are kept in the process
+for a while. Failed lookups are cached for a shorter time, so that links to a domain which does not exist fail right away. """
+
+from typing import Dict, List, Tuple, Union
+
+import socket
+import threading
+import time
+
+from loguru import logger
+
+
+class DnsCache:
+    """ Thread safe cache of socket.getaddrinfo results, installed process wide by install().
+    :param ttl: float - the number of seconds a resolved address is reused
+    :param negative_ttl: float - the number of seconds a failed lookup is reused
+    """
+
+    def __init__(self, ttl: float = 300, negative_ttl: float = 30):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._lock = threading.Lock()
+        # (host, port, family, type, proto, flags) -> (expiry, addresses or the arguments of the gaierror)
+        self._entries: Dict[tuple, Tuple[float, Union[List[tuple], tuple]]] = {}
+        self._resolve = socket.getaddrinfo
+
+        self.lookups = 0
+        self.hits = 0
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """ Drop-in replacement of socket.getaddrinfo. """
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+            else:
+                entry = None
+
+        if entry is not None:
+            if isinstance(entry[1], tuple):
+                # a new exception every time, re-raising the cached one would grow its traceback
+                raise socket.gaierror(*entry[1])
+
+            return list(entry[1])
+
+        try:
+            addresses = self._resolve(host, port, family, type, proto, flags)
+
+        except socket.gaierror as e:
+            with self._lock:
+                self._entries[key] = (now + self.negative_ttl, e.args)
+            raise
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+
+        return list(addresses)
+
+    def install(self):
+        """ Resolves all hosts of the process through the cache. """
+        socket.getaddrinfo = self.getaddrinfo
+
+    def uninstall(self):
+        if socket.getaddrinfo == self.getaddrinfo:
+            socket.getaddrinfo = self._resolve
+
+    def log_statistics(self):
+        hit_rate = self.hits / self.lookups if self.lookups else 0
+        logger.info(f"DNS cache: {self.lookups} lookups of {len(self._entries)} hosts ({hit_rate:.1%} cached)")
@@ -0,0 +1,151 @@
+""" This module holds the crawl frontier of the discovery mode. Instead of only crawling the pages listed in the sitemaps,
+the internal links found on the crawled pages are crawled as well, breadth first up to a maximum depth and number of pages.
+Websites with faceted search or calendars have millions of url permutations, so the visited pages are not kept as urls
+but as 64 bit hashes, which move into a Bloom filter of fixed size once there are too many of them. """
+
+from typing import Deque, Optional, Set, Tuple
+
+import hashlib
+import math
+from collections import deque
+
+from loguru import logger
+
+
+class VisitedSet:
+    """ Set of urls with bounded memory. Up to exact_limit urls their 64 bit hashes are kept in a set, which is exact for
+    all practical purposes. Beyond that all hashes are moved into a Bloom filter sized for capacity urls at the given
+    error rate. A Bloom filter never forgets a visited url, but it may take a new url for a visited one, i.e. a small
+    share of the pages of a huge crawl is skipped.
+    :param capacity: int - the number of urls the Bloom filter is sized for, at least twice the urls it takes over from
+        the exact set. Beyond capacity the false positive rate rises.
+    :param error_rate: float - the false positive rate of the Bloom filter at capacity
+    :param exact_limit: int - the number of urls kept exactly before switching to the Bloom filter
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001, exact_limit: int = 100_000):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.exact_limit = exact_limit
+
+        self._hashes: Optional[Set[int]] = set()
+        self._bits: Optional[bytearray] = None
+        self._bit_count = 0
+        self._hash_count = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, url: str) -> bool:
+        url_hash = self._hash(url)
+
+        if self._hashes is not None:
+            return url_hash in self._hashes
+
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(url_hash))
+
+    @property
+    def is_exact(self) -> bool:
+        return self._hashes is not None
+
+    @staticmethod
+    def _hash(url: str) -> int:
+        return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "little")
+
+    def _positions(self, url_hash: int):
+        # double hashing: the k positions are derived from the two halves of the 64 bit hash
+        first, second = url_hash & 0xFFFFFFFF, (url_hash >> 32) | 1
+        return ((first + index * second) % self._bit_count for index in range(self._hash_count))
+
+    def _set_bits(self, url_hash: int):
+        for position in self._positions(url_hash):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def _switch_to_bloom_filter(self):
+        # a filter smaller than the urls it takes over would be saturated right away
+        capacity = max(self.capacity, 2 * len(self._hashes))
+        self._bit_count = math.ceil(-capacity * math.log(self.error_rate) / math.log(2) ** 2)
+        self._hash_count = max(1, round(self._bit_count / capacity * math.log(2)))
+        self._bits = bytearray((self._bit_count + 7) // 8)
+
+        for url_hash in self._hashes:
+            self._set_bits(url_hash)
+
+        self._hashes = None
+        logger.info(f"More than {self.exact_limit} visited pages, switching to a Bloom filter of {len(self._bits) / 1024 / 1024:.1f} MiB")
+
+    def add(self, url: str):
+        url_hash = self._hash(url)
+        self._count += 1
+
+        if self._hashes is None:
+            self._set_bits(url_hash)
+            return
+
+        self._hashes.add(url_hash)
+
+        if len(self._hashes) > self.exact_limit:
+            self._switch_to_bloom_filter()
+
+
+class CrawlFrontier:
+    """ Deduplicated breadth first queue of the pages to crawl. All urls are expected in their canonical form
+    (see normalize_url), so that permutations like a fragment or a default port do not count as new pages.
+    :param max_depth: int - the maximum number of links between the main url (or a sitemap page) and a crawled page
+    :param max_pages: int - the maximum number of pages crawled, including the sitemap pages
+
+    The visited set is sized for max_pages. Pages are only queued while fewer than max_pages are known, so the Bloom
+    filter is within its capacity as long as it decides which pages are crawled. Beyond that it holds the sitemap pages
+    over the limit and the dropped pages, which are remembered so that each of them is counted once. Once the filter
+    is saturated, dropped is a lower bound.
+    """
+
+    def __init__(self, max_depth: int = 5, max_pages: int = 10_000):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+
+        self.visited = VisitedSet(capacity=max_pages)
+        self._queue: Deque[Tuple[str, int]] = deque()
+
+        # pages crawled without the frontier and pages queued, the visited set holds the dropped pages as well
+        self._page_count = 0
+
+        # discovered pages that were not queued because of the page limit
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def visit(self, url: str) -> bool:
+        """ Marks a page that is crawled without the frontier, e.g. a sitemap page.
+        :return: False if the page has been visited already
+        """
+        if url in self.visited:
+            return False
+
+        self.visited.add(url)
+        self._page_count += 1
+        return True
+
+    def add(self, url: str, depth: int) -> bool:
+        """ Queues a discovered page unless it has been visited already or a limit is reached.
+        :return: True if the page was queued
+        """
+        if depth > self.max_depth or url in self.visited:
+            return False
+
+        self.visited.add(url)
+
+        if self._page_count >= self.max_pages:
+            # a page linked from many pages is counted once
+            self.dropped += 1
+            return False
+
+        self._page_count += 1
+        self._queue.append((url, depth))
+        return True
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """ Returns the next page and its depth, pages closer to the main url come first. """
+        return self._queue.popleft() if self._queue else None
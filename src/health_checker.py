@@ -1,7 +1,7 @@
-""" This module holds the main health checking class. It is reponsible for checking the health status of a website, 
+""" This module holds the main health checking class. It is reponsible for checking the health status of a website,
 including broken links and missing resources. It is the main entry point of the application. """
 
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import enum
 from dataclasses import dataclass
@@ -10,19 +10,91 @@ from pathlib import Path
 
 import json
 
+import asyncio
+import functools
+import multiprocessing
+import sys
 import time
-import random
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
 
 import requests
-from bs4 import BeautifulSoup
 from loguru import logger
 
-from src.data_objects import LinkRecord, LinkType
-from src.link_extractor import extract_links_in_page, extract_resources_in_page
+from src.checkpoint import CheckpointState, CrawlCheckpoint
+from src.circuit_breaker import CircuitState, HostCircuitBreaker
+from src.data_objects import LinkCategory, LinkRecord, LinkStatus, LinkType, ParsedPage, SitemapEntry
+from src.dns_cache import DnsCache
+from src.frontier import CrawlFrontier
+from src.http_client import DEFAULT_TIMEOUT, HttpClient
+from src.link_cache import LinkCache
+from src.link_prober import ACCEPTED_STATUS_CODES, NOT_MODIFIED_STATUS_CODE, LinkProber, ProbeResult
+from src.rate_limiter import BACKOFF_STATUS_CODES, HostRateLimiter
+from src.metrics import CrawlMetrics, LatencyHistogram
+from src.page_store import PageStore, RunDiff
+from src.link_registry import LinkRegistry, SharedLinkResults, is_valid_url, normalize_url, resolve_link
+from src.link_extractor import parse_page
 from src.sitemap import get_sitemap_urls
 from src.report import HtmlReportPrinter
 
 
+ROOT_PATH = Path(__file__).parent.parent
+
+
+def load_config(config_file_path: Path) -> dict:
+    if not config_file_path.exists():
+        logger.error("Config file not found! Place a config.json file in the root directory of the project!")
+
+    with open(config_file_path, "r") as file:
+        return json.load(file)
+
+
+def create_link_cache(config: dict) -> LinkCache:
+    return LinkCache(
+        database_path=Path(config.get("cache_path", ROOT_PATH.joinpath("cache", "link_cache.sqlite3"))),
+        ttl=config.get("cache_ttl", {}),
+        domain_ttl=config.get("cache_domain_ttl", {})
+    )
+
+
+def create_page_store(config: dict) -> PageStore:
+    return PageStore(database_path=Path(config.get("page_store_path") or ROOT_PATH.joinpath("cache", "page_store.sqlite3")))
+
+
+def create_rate_limiter(config: dict) -> HostRateLimiter:
+    # politeness per host - the default of one request per second equals the former fixed delays
+    return HostRateLimiter(
+        default_rate=config.get("host_rate_limit", 1.0),
+        host_rates=config.get("host_rate_limits", {}),
+        burst=config.get("host_rate_limit_burst", 1)
+    )
+
+
+def create_circuit_breaker(config: dict) -> HostCircuitBreaker:
+    return HostCircuitBreaker(
+        failure_threshold=config.get("circuit_breaker_failures", 5),
+        reset_timeout=config.get("circuit_breaker_reset", 60)
+    )
+
+
+def create_http_client(config: dict, per_host_concurrency: int, metrics: CrawlMetrics) -> HttpClient:
+    dns_cache_ttl = config.get("dns_cache_ttl", 300)
+
+    return HttpClient(
+        headers=WebsiteHealthChecker.HEADERS,
+        pool_hosts=config.get("http_pool_hosts", 100),
+        pool_size_per_host=config.get("http_pool_size_per_host", max(10, per_host_concurrency)),
+        max_connections=config.get("http_max_connections"),
+        metrics=metrics,
+        # the default timeout applies to the sitemaps and pages, the link checks can set their own per LinkType
+        timeout=config.get("request_timeouts", {}).get("default", DEFAULT_TIMEOUT),
+        max_body_bytes=config.get("max_body_bytes", 10 * 1024 * 1024),
+        max_body_read_time=config.get("max_body_read_time", 60),
+        dns_cache=DnsCache(ttl=dns_cache_ttl, negative_ttl=config.get("dns_negative_ttl", 30)) if dns_cache_ttl else None
+    )
+
+
 class WebsiteHealthChecker:
     HEADERS = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
@@ -34,30 +106,62 @@ class WebsiteHealthChecker:
             "Referer": "https://www.google.com/"
     }
 
-    def __init__(self, main_url):
+    def __init__(self, main_url, concurrency=1, per_host_concurrency=1, parser_workers=1, http_client: HttpClient = None, config: dict = None,
+                 resume=False, link_cache: LinkCache = None, rate_limiter: HostRateLimiter = None, shared_results: SharedLinkResults = None,
+                 circuit_breaker: HostCircuitBreaker = None, discover=False, incremental=False, page_store: PageStore = None):
+        """ The http client, link cache, rate limiter, circuit breaker, shared results and page store can be passed in to share
+        them between the health checks of several websites, otherwise they are created from the config.
+        With discover the internal links of the crawled pages are crawled as well, not only the sitemap pages.
+        With incremental the sitemap pages whose lastmod did not change since the last run are not fetched again.
+        """
         self.main_url = main_url
 
-        # Instantiate needed classes
-        self.report_printer = HtmlReportPrinter()
-
-        # main record of broken links and missing resources
-        self.broken_links: List[LinkRecord] = []
-        self.redirected_links : List[LinkRecord] = []
-
-        # used as cache to avoid checking the same link/resource multiple times
-        self.working_links: List[LinkRecord] = []
+        # continue the crawl from the checkpoint of a previous run that did not finish
+        self.resume = resume
+        self._processed_pages = set()
+        self._resumed_results = {}
+
+        # discovery mode: the pages found by following internal links, created when the crawl starts
+        self.discover = discover
+        self.frontier: Optional[CrawlFrontier] = None
+        # pages handed out to the fetchers whose links have not been scheduled yet, they may still discover new pages
+        self._pages_in_flight = 0
+        self._frontier_changed = None
+        self._sitemap_done = False
+        self._sitemap_page_count = 0
+
+        # main record of all checked links, also used as cache to avoid checking the same link/resource multiple times
+        self.link_registry = LinkRegistry()
+
+        # anchors (element ids and <a name>) of the parsed pages, #fragment links are validated against them without any request
+        self._page_anchors: Dict[str, frozenset] = {}
+        # fragment links to pages which have not been parsed yet: page -> [(fragment, page the link was found in)]
+        self._pending_fragments: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+
+        # Async engine settings - the maximum number of requests in flight overall and per host
+        self.concurrency = max(1, concurrency)
+        self.per_host_concurrency = max(1, per_host_concurrency)
+
+        # number of processes parsing the fetched pages
+        self.parser_workers = max(1, parser_workers)
+
+        self._executor = None
+        self._request_slots = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._link_tasks = set()
+        self._sitemap_lock = None
+
+        # wall time per stage, request latency, bytes and status counts of the run
+        self.metrics = CrawlMetrics()
+        self.stage_timer = self.metrics.stage_timer
+        self._page_index = -1
 
         # Paths
-        self.root_path = Path(__file__).parent.parent
+        self.root_path = ROOT_PATH
 
-        # get base config
+        # get base config - a config passed in directly replaces the config.json file
         self.config_file_path = self.root_path.joinpath("config.json")
-
-        if not self.config_file_path.exists():
-            logger.error("Config file not found! Place a config.json file in the root directory of the project!")
-
-        with open(self.config_file_path, "r") as file:
-            self.config = json.load(file)
+        self.config = config if config is not None else load_config(self.config_file_path)
 
         self.valid_email_addresses = self.config.get("valid_email_addresses", [])
         self.skip_check_urls = self.config.get("skip_check_urls", [])
@@ -65,51 +169,126 @@ class WebsiteHealthChecker:
 
         logger.info(f"Found the following valid email addresses in the config file: {self.valid_email_addresses}")
 
+        # Instantiate needed classes
+        self.report_printer = HtmlReportPrinter(records_per_page=self.config.get("report_records_per_page", 1000))
+
+        # the metrics are written next to the report unless a directory is configured, 0 only exports at the end
+        self.metrics_path = self.config.get("metrics_path")
+        self.metrics_export_interval = self.config.get("metrics_export_interval", 0)
+
+        # one checkpoint file per website, so that checkpoints of different websites do not overwrite each other
+        self.checkpoint = CrawlCheckpoint(
+            path=Path(self.config.get("checkpoint_path") or self.root_path.joinpath("cache", "checkpoints", f"{self.site_name}.jsonl")),
+            main_url=self.main_url
+        )
+        self.checkpoint_interval = self.config.get("checkpoint_interval", 30)
+
+        # seconds after which the crawl stops and writes a partial report, 0 for no limit
+        self.crawl_deadline = self.config.get("crawl_deadline", 0)
+        self.deadline_reached = False
+
+        # links whose check took at least slow_link_threshold seconds and the response times of the link checks per host
+        self.slow_link_threshold = self.config.get("slow_link_threshold", 2)
+        self.slow_links: List[LinkRecord] = []
+        self.host_latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+
+        self.link_cache = link_cache or create_link_cache(self.config)
+
+        # incremental mode: the lastmod and links of the sitemap pages and the link results of the last run
+        self.page_store = page_store or (create_page_store(self.config) if incremental else None)
+        self.reused_pages = 0
+        self.rate_limiter = rate_limiter or create_rate_limiter(self.config)
+        self.rate_limit_retries = self.config.get("rate_limit_retries", 2)
+        self.circuit_breaker = circuit_breaker or create_circuit_breaker(self.config)
+
+        # one pooled http client is shared by the sitemap discovery, the page crawl and the link checks
+        self.http_client = http_client or create_http_client(self.config, self.per_host_concurrency, self.metrics)
+
+        # results of links on other hosts, shared with the health checks of other websites in a batch
+        self.shared_results = shared_results
+        self._main_page = normalize_url(self.main_url)
+        self._main_host = urlparse(self._main_page).netloc
+
+        self.link_prober = LinkProber(
+            http_client=self.http_client,
+            strategies=self.config.get("probe_strategies", {}),
+            head_unsupported_hosts=self.config.get("head_unsupported_hosts", []),
+            timeouts=self.config.get("request_timeouts", {})
+        )
+
+    @property
+    def site_name(self):
+        """ The host of the main url usable as file name, e.g. www.example.com or localhost_8080. """
+        return urlparse(self.main_url).netloc.replace(":", "_")
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """ Runs a blocking function (e.g. requests.get) in the worker thread pool without blocking the event loop. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _wait_for_host(self, url):
+        """ Waits until the rate limiter of the host of the given url allows the next request.
+        The delay only blocks the requests to the same host.
+        """
+        delay = self.rate_limiter.reserve(urlparse(url).netloc)
+
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _host_slot(self, link):
+        """ Returns the semaphore limiting the number of parallel requests to the host of the given link. """
+        host = urlparse(link).netloc
+
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_concurrency)
+
+        return self._host_slots[host]
+
     def _check_link_health(self, origin_page_url, link, link_type):
             if not link:
                 # skip empty links that have no href or src attribute (inline script tags, etc.)
                 return
 
+            resolved_link = resolve_link(origin_page_url, link)
+
+            if resolved_link is None:
+                # javascript: and data: links can not be requested
+                return
+
+            if not is_valid_url(resolved_link):
+                # e.g. http://[oops or a port out of range, requests would fail with InvalidURL
+                if not self.link_registry.add_found_in(resolved_link, origin_page_url):
+                    logger.error(f"Invalid link: {resolved_link}")
+                    self.link_registry.add(LinkRecord(link=resolved_link, resource_type=link_type, status_code=LinkStatus.ERROR), LinkCategory.BROKEN, found_in=origin_page_url)
+                return
+
+            if "#" in resolved_link:
+                self._check_link_fragment(origin_page_url, resolved_link)
+
+            # check if the link has already been checked or is currently being checked
+            if self.link_registry.add_found_in(resolved_link, origin_page_url):
+                return
+
             if link in self.skip_check_urls:
                 # skip links that are defined in the config file as valid
-                self.working_links.append(LinkRecord(link=link, found_in_page=[origin_page_url], resource_type=link_type, status_code="SKIP-URL"))
+                self.link_registry.add(LinkRecord(link=resolved_link, resource_type=link_type, status_code=LinkStatus.SKIP_URL), LinkCategory.WORKING, found_in=origin_page_url)
                 return
-            
+
             for pattern in self.skip_check_url_patterns:
                 if pattern in link:
                     # skip links that match a pattern defined in the config file - e.g. social media sharing links.
                     # Social media pages are often highly restrictive and not reachable with requests
-                    self.working_links.append(LinkRecord(link=link, found_in_page=[origin_page_url], resource_type=link_type, status_code="SKIP-PATTERN"))
+                    self.link_registry.add(LinkRecord(link=resolved_link, resource_type=link_type, status_code=LinkStatus.SKIP_PATTERN), LinkCategory.WORKING, found_in=origin_page_url)
                     return
 
-            if link[0] == "#":
-                # add the origin_page_url to id-links
-                link = origin_page_url + link
-
-            if link[0] == "/":
-                # add the main_url to links relative to the domain
-                link = self.main_url + link
-
-            if link[0] != "h" and link[0] != "/" and "mailto" not in link:
-                # add the origin_page_url to relative links
-                link = origin_page_url + link
-            
-            # check if the link has already been checked
-            for working_link in self.working_links:
-                if working_link.link == link:
-                    working_link.found_in_page.append(origin_page_url)
-                    return
-                
-            for redirected_link in self.redirected_links:
-                if redirected_link.link == link:
-                    redirected_link.found_in_page.append(origin_page_url)
-                    return
-            
-            for broken_link in self.broken_links:
-                if broken_link.link == link:
-                    broken_link.found_in_page.append(origin_page_url)
-                    return
-                
+            link = resolved_link
+
+            if normalize_url(link) in self._resumed_results:
+                # the link has already been checked before the crawl was resumed
+                status_code, category = self._resumed_results[normalize_url(link)]
+                self.link_registry.add(LinkRecord(link=link, resource_type=link_type, status_code=status_code), category, found_in=origin_page_url)
+                return
+
             logger.info(f"Checking link: {link}")
 
             if link.startswith("mailto"):
@@ -118,98 +297,710 @@ class WebsiteHealthChecker:
                 mail_address_in_link = link.replace("mailto:", "").split("?")[0]
                 logger.info(f"Checking email address: {mail_address_in_link}, {link}")
                 if mail_address_in_link and mail_address_in_link not in self.valid_email_addresses:
-                    self.broken_links.append(LinkRecord(link=link, found_in_page=[origin_page_url], resource_type=LinkType.EMAIL, status_code=""))
+                    self.link_registry.add(LinkRecord(link=link, resource_type=LinkType.EMAIL), LinkCategory.BROKEN, found_in=origin_page_url)
                     return
-                
-                self.working_links.append(LinkRecord(link=link, found_in_page=[origin_page_url], resource_type=LinkType.EMAIL, status_code=""))
-                return
-            
-            # Standard link - check if it is reachable
-            time.sleep(0.5 + 1 * random.randint(0, 1))
 
-            try:
-                response = requests.get(link, headers=self.HEADERS)
+                self.link_registry.add(LinkRecord(link=link, resource_type=LinkType.EMAIL), LinkCategory.WORKING, found_in=origin_page_url)
+                return
 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error while checking link: {link} - {e}")
-                self.broken_links.append(LinkRecord(link=link, found_in_page=[origin_page_url], resource_type=link_type, status_code="ERROR"))
+            if link.startswith("tel:"):
+                # telephone links can not be requested, they are listed for completeness
+                self.link_registry.add(LinkRecord(link=link, resource_type=LinkType.TELEPHONE), LinkCategory.WORKING, found_in=origin_page_url)
                 return
-                    
-            link_record = LinkRecord(link=link, found_in_page=[origin_page_url], resource_type=link_type, status_code=response.status_code)
-
-            if response.status_code not in [200, 400, 403, 999]:
-                # a link is defined as not to be broken if it returns 200, 400 or 403 (999 is used by linkedin to block scraping)
-                # 403 is used as a workaround, since this is usually caused by calling the page with python requests
-                # 404 and 500 codes are considered broken
-                self.broken_links.append(link_record)
+
+            # Standard link - schedule the request on the async engine
+            link_record = LinkRecord(link=link, resource_type=link_type)
+            self.link_registry.add(link_record, LinkCategory.PENDING, found_in=origin_page_url)
+
+            task = asyncio.create_task(self._request_link_health(link_record))
+            self._link_tasks.add(task)
+            task.add_done_callback(functools.partial(self._link_check_done, link_record))
+
+    def _link_check_done(self, link_record: LinkRecord, task: asyncio.Task):
+        """ Removes a finished link check. A check that failed unexpectedly is reported as broken, a single link must
+        neither abort the crawl nor stay pending.
+        """
+        self._link_tasks.discard(task)
+
+        if task.cancelled() or task.exception() is None:
+            return
+
+        logger.opt(exception=task.exception()).error(f"Unexpected error while checking link: {link_record.link}")
+
+        if link_record.category == LinkCategory.PENDING:
+            link_record.status_code = LinkStatus.ERROR
+            self._finish_link_check(link_record, LinkCategory.BROKEN)
+
+    async def _wait_for_link_checks(self):
+        """ Waits for all scheduled link checks to finish, including the ones scheduled while waiting. """
+        while self._link_tasks:
+            # the failed checks are logged and reported by _link_check_done
+            await asyncio.gather(*self._link_tasks, return_exceptions=True)
+
+    def _check_link_fragment(self, origin_page_url, link):
+        """ Validates the #fragment of a link to a page of the website against the anchors of that page. The page itself
+        is checked like any other link. Fragments of links to other websites are not validated, that would need a request.
+        """
+        page_url, _, fragment = link.partition("#")
+
+        # an empty fragment and #top scroll to the top of any page
+        if not fragment or fragment.lower() == "top":
+            return
+
+        page_key = normalize_url(page_url)
+
+        if urlparse(page_key).netloc != self._main_host:
+            return
+
+        anchors = self._page_anchors.get(page_key)
+
+        if anchors is None:
+            # validated once the page has been parsed
+            self._pending_fragments[page_key].append((fragment, origin_page_url))
+            return
+
+        self._validate_fragment(page_key, fragment, origin_page_url, anchors)
+
+    def _validate_fragment(self, page_key, fragment, origin_page_url, anchors: frozenset):
+        if fragment in anchors or unquote(fragment) in anchors:
+            return
+
+        anchor_link = f"{page_key}#{fragment}"
+
+        if self.link_registry.add_found_in(anchor_link, origin_page_url, keep_fragment=True):
+            return
+
+        anchor_record = LinkRecord(link=anchor_link, resource_type=LinkType.LINK, status_code=LinkStatus.MISSING_ANCHOR)
+        self.link_registry.add(anchor_record, LinkCategory.MISSING_ANCHOR, found_in=origin_page_url, keep_fragment=True)
+
+    def _add_page_anchors(self, url, anchors: List[str]):
+        """ Stores the anchors of a parsed page and validates the fragment links that have been waiting for them. """
+        page_key = normalize_url(url)
+
+        # ids like "content" or "footer" repeat on every page, interning keeps one copy of each
+        page_anchors = self._page_anchors[page_key] = frozenset(sys.intern(anchor) for anchor in anchors)
+
+        for fragment, origin_page_url in self._pending_fragments.pop(page_key, ()):
+            self._validate_fragment(page_key, fragment, origin_page_url, page_anchors)
+
+    async def _request_link_health(self, link_record: LinkRecord):
+        """ Checks a scheduled link. With shared results, links on other hosts are checked only once for all websites
+        of a batch: the first website requesting a link checks it, the others wait for its result.
+        """
+        if self.shared_results is None or urlparse(link_record.link).netloc == self._main_host:
+            await self._check_link(link_record)
+            return
+
+        result, is_owner = self.shared_results.claim(link_record.link)
+
+        if not is_owner:
+            # shielded, so that a cancelled website does not cancel the check for the others
+            shared_result = await asyncio.shield(result)
+
+            if shared_result is None:
+                # the website checking the link stopped at its crawl deadline
+                await self._request_link_health(link_record)
                 return
-            
-            if response.history:
-                # check if the link was redirected
-                link_record.status_code = response.history[0].status_code
-                self.redirected_links.append(link_record)
+
+            link_record.status_code, category = shared_result
+            self._finish_link_check(link_record, category)
+            return
+
+        try:
+            await self._check_link(link_record)
+
+        except asyncio.CancelledError:
+            # the crawl deadline of this website was reached, a waiting website checks the link itself
+            self.shared_results.release(link_record.link)
+            result.set_result(None)
+            raise
+
+        finally:
+            if not result.done():
+                # a check that failed unexpectedly leaves the record pending, the waiting websites report it as broken
+                failed = link_record.category == LinkCategory.PENDING
+                result.set_result((LinkStatus.ERROR, LinkCategory.BROKEN) if failed else (link_record.status_code, link_record.category))
+
+    async def _check_link(self, link_record: LinkRecord):
+        """ Requests a scheduled link and sorts its record into the working, redirected or broken links.
+        At most `per_host_concurrency` requests are sent to the same host and `concurrency` requests overall.
+        """
+        link = link_record.link
+        host = urlparse(link).netloc
+
+        cached_result, checked_at = self.link_cache.get(link) or (None, None)
+
+        if cached_result and self.link_cache.is_fresh(link, link_record.resource_type, checked_at):
+            # the link has been checked recently in a previous run
+            probe_result = cached_result
+
+        else:
+            try:
+                async with self._host_slot(link):
+                    for attempt in range(self.rate_limit_retries + 1):
+                        if not self.circuit_breaker.allow(host):
+                            # the host failed too many connection attempts, the link would only wait for its timeout
+                            link_record.status_code = LinkStatus.HOST_DOWN
+                            self._finish_link_check(link_record, LinkCategory.BROKEN)
+                            return
+
+                        # a request let through while the host is half-open is its trial request
+                        trial = self.circuit_breaker.state(host) == CircuitState.HALF_OPEN
+                        await self._wait_for_host(link)
+
+                        try:
+                            async with self._request_slots:
+                                with self.stage_timer.measure("check"):
+                                    probe_result = await self._probe(link_record, cached_result)
+
+                        except requests.exceptions.ConnectionError:
+                            # includes DNS and TLS errors and connect timeouts
+                            self.circuit_breaker.record_failure(host)
+                            raise
+
+                        except requests.exceptions.RequestException:
+                            # e.g. a read timeout or a body over budget, the host accepted the connection so it is not down
+                            self.circuit_breaker.record_success(host)
+                            raise
+
+                        finally:
+                            if trial:
+                                # a cancelled trial request must not keep the host half-open for good
+                                self.circuit_breaker.release_trial(host)
+
+                        self.circuit_breaker.record_success(host)
+                        self.rate_limiter.report(host, probe_result.status_code, probe_result.retry_after)
+
+                        if probe_result.status_code not in BACKOFF_STATUS_CODES:
+                            break
+
+            except (requests.exceptions.RequestException, ValueError) as e:
+                # ValueError: urllib3 can not connect to the url, e.g. LocationParseError for a host with an empty label
+                logger.error(f"Error while checking link: {link} - {e}")
+                link_record.status_code = LinkStatus.ERROR
+                self._finish_link_check(link_record, LinkCategory.BROKEN)
                 return
 
-            self.working_links.append(link_record)
+            if probe_result.status_code == NOT_MODIFIED_STATUS_CODE and cached_result:
+                # the link did not change since the previous run
+                probe_result = cached_result
+
+            self.link_cache.store(link, probe_result)
+
+        link_record.status_code = probe_result.status_code
+
+        if probe_result.status_code not in ACCEPTED_STATUS_CODES:
+            # 404 and 500 codes are considered broken
+            self._finish_link_check(link_record, LinkCategory.BROKEN)
+            return
+
+        if probe_result.redirect_status_code:
+            # check if the link was redirected
+            link_record.status_code = probe_result.redirect_status_code
+            self._finish_link_check(link_record, LinkCategory.REDIRECTED)
+            return
+
+        self._finish_link_check(link_record, LinkCategory.WORKING)
+
+    async def _probe(self, link_record: LinkRecord, cached_result: Optional[ProbeResult]) -> ProbeResult:
+        """ Probes a link in a worker thread and records how long it took. Failed requests are recorded as well,
+        timeouts are usually the slowest links of a crawl. With retries the last attempt counts.
+        """
+        start = time.perf_counter()
+
+        try:
+            probe_result = await self._run_blocking(self.link_prober.probe, link_record.link, link_record.resource_type, cached_result)
+        except (requests.exceptions.RequestException, ValueError):
+            self._record_response_time(link_record, time.perf_counter() - start)
+            raise
+
+        self._record_response_time(link_record, time.perf_counter() - start)
+        return probe_result
+
+    def _record_response_time(self, link_record: LinkRecord, duration: float):
+        link_record.response_time = duration
+        self.host_latency[urlparse(link_record.link).netloc].observe(duration)
+
+    def _finish_link_check(self, link_record: LinkRecord, category: LinkCategory):
+        """ Sorts a checked record into its final category and adds the result to the checkpoint.
+        Records that took at least slow_link_threshold seconds are listed as slow links as well.
+        """
+        if link_record.response_time is not None and link_record.response_time >= self.slow_link_threshold:
+            self.slow_links.append(link_record)
+
+        self.link_registry.set_category(link_record, category)
+        self.checkpoint.add_result(link_record.link, link_record.status_code, category)
+
+    def _start_discovery(self):
+        """ Creates the frontier of the discovery mode, seeded with the main url. """
+        self.frontier = CrawlFrontier(
+            max_depth=self.config.get("discovery_max_depth", 5),
+            max_pages=self.config.get("discovery_max_pages", 10000)
+        )
+
+        for url in self._processed_pages:
+            self.frontier.visit(normalize_url(url))
+
+        self.frontier.add(self._main_page, 0)
+
+    def _discover_pages(self, page_url, depth, links):
+        """ Adds the internal links of a crawled page to the frontier. Links skipped by the config are not crawled either. """
+        for link, link_type in links:
+            if link_type != LinkType.LINK or link in self.skip_check_urls:
+                continue
+
+            resolved_link = resolve_link(page_url, link)
+
+            if resolved_link is None or not resolved_link.startswith(("http://", "https://")) or not is_valid_url(resolved_link):
+                continue
+
+            if any(pattern in link for pattern in self.skip_check_url_patterns):
+                continue
+
+            page = normalize_url(resolved_link)
+
+            if urlparse(page).netloc == self._main_host:
+                self.frontier.add(page, depth + 1)
+
+    async def _next_page(self, sitemap_urls) -> Optional[Tuple[str, int, Optional[str]]]:
+        """ Returns the next page to fetch, its depth and its sitemap lastmod: the sitemap pages first, then the pages of
+        the frontier. The frontier is only empty for good once no page is in flight anymore.
+        """
+        while not self._sitemap_done:
+            entry = await self._next_sitemap_url(sitemap_urls)
+
+            if entry is None:
+                self._sitemap_done = True
+
+                if not self._sitemap_page_count and self.frontier is None:
+                    logger.warning("No sitemap pages found, discovering the pages by following the links of the main url")
+                    self._start_discovery()
+
+                continue
+
+            if entry.is_sitemap:
+                # a sitemap that could not be read is reported as broken, the other sitemaps are read on
+                self._add_sitemap_page(entry.loc, entry.status_code)
+                continue
+
+            self._sitemap_page_count += 1
+            url = entry.loc
+
+            if self.frontier is not None:
+                # a sitemap page the frontier has queued already is crawled as sitemap page now and skipped by the frontier later
+                url = normalize_url(url)
+                self.frontier.visit(url)
+
+            self._pages_in_flight += 1
+            return url, 0, entry.lastmod
+
+        if self.frontier is None:
+            return None
+
+        async with self._frontier_changed:
+            while (page := self.frontier.pop()) is None:
+                if not self._pages_in_flight:
+                    return None
+
+                await self._frontier_changed.wait()
+
+            self._pages_in_flight += 1
+            url, depth = page
+            return url, depth, None
+
+    async def _page_done(self):
+        async with self._frontier_changed:
+            self._pages_in_flight -= 1
+            self._frontier_changed.notify_all()
+
+    def _add_sitemap_page(self, url, status_code):
+        """ Adds the record of a fetched sitemap page or of a sitemap that could not be read, unless the url has already
+        been found as a link.
+        """
+        self._processed_pages.add(url)
+
+        if not self.link_registry.add_found_in(url, "Sitemap"):
+            sitemap_link_record = LinkRecord(link=url, resource_type=LinkType.LINK, status_code=status_code)
+            self.link_registry.add(sitemap_link_record, LinkCategory.WORKING if status_code == 200 else LinkCategory.BROKEN, found_in="Sitemap")
+
+    def _resume_from_checkpoint(self, state: CheckpointState):
+        """ Rebuilds the records of the processed pages. Links with a result are not requested again,
+        links which were still pending when the previous crawl stopped are scheduled again.
+        """
+        logger.info(f"Resuming crawl with {len(state.pages)} processed pages and {len(state.results)} checked links")
+
+        self._resumed_results = state.results
+
+        if self.frontier is None and any(depth for _, _, _, depth in state.pages.values()):
+            # the previous crawl discovered pages, most likely because the website has no sitemap
+            self._start_discovery()
+
+        if self.frontier is not None:
+            # all processed pages are marked first, so that they are not discovered as new pages again
+            for url in state.pages:
+                self.frontier.visit(normalize_url(url))
+
+        for url, (status_code, links, anchors, depth) in state.pages.items():
+            self._add_fetched_page(url, depth, status_code)
+
+            if status_code == 200:
+                self._add_page_anchors(url, anchors)
+
+                if self.frontier is not None:
+                    self._discover_pages(url, depth, links)
+
+            for link, link_type in links:
+                self._check_link_health(url, link, link_type)
+
+        self._resumed_results = {}
+
+    async def _flush_checkpoint_periodically(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            await self._run_blocking(self.checkpoint.flush)
+
+    async def _next_sitemap_url(self, sitemap_urls) -> Optional[SitemapEntry]:
+        """ Returns the next page entry of the sitemap generator, or None if all entries have been read. """
+        # the generator may only be advanced by one thread at a time
+        async with self._sitemap_lock:
+            with self.stage_timer.measure("sitemap"):
+                return await self._run_blocking(next, sitemap_urls, None)
+
+    def _fetch_page(self, url) -> Tuple[requests.Response, Optional[bytes]]:
+        """ Fetches a page, the body is only read for an html page that can be parsed. """
+        response = self.http_client.get(url, stream=True)
+        content_type = response.headers.get("Content-Type", "")
+
+        if response.status_code != 200 or (content_type and "html" not in content_type):
+            response.close()
+            return response, None
+
+        return response, self.http_client.read_body(response)
+
+    def _add_fetched_page(self, url, depth, status_code):
+        """ Sitemap pages get a record of their own. The main url and the discovered pages already have one,
+        they are checked like any other link.
+        """
+        if depth or url == self._main_page:
+            self._processed_pages.add(url)
+        else:
+            self._add_sitemap_page(url, status_code)
+
+    def _add_page_links(self, url, depth, links, anchors):
+        """ Schedules the link checks of a parsed or reused page. """
+        # the anchors are added first, so that links to fragments of the same page can be validated right away
+        self._add_page_anchors(url, anchors)
+
+        for link, link_type in links:
+            self._check_link_health(url, link, link_type)
+
+        if self.frontier is not None:
+            self._discover_pages(url, depth, links)
+
+        self.checkpoint.add_page(url, 200, links, anchors, depth)
+
+    def _reuse_page(self, url, lastmod) -> bool:
+        """ Schedules the link checks of a sitemap page with the links stored in the last run, if its lastmod did not change.
+        :return: False if the page has to be fetched
+        """
+        stored_page = self.page_store.get_page(self.site_name, url, lastmod)
+
+        if stored_page is None:
+            return False
+
+        logger.info(f"Reusing unchanged sitemap-url #{self._page_index}: {url}")
+
+        links, anchors = stored_page
+        self._add_fetched_page(url, 0, 200)
+        self._add_page_links(url, 0, links, anchors)
+        self.reused_pages += 1
+        return True
+
+    async def _fetch_pages(self, sitemap_urls, pages: asyncio.Queue):
+        """ Pipeline stage 1: fetches the sitemap and discovered pages and hands their bodies to the parsers. """
+        while (page := await self._next_page(sitemap_urls)) is not None:
+            url, depth, lastmod = page
+
+            if url in self._processed_pages:
+                # already processed before the crawl was resumed or listed twice in the sitemaps
+                await self._page_done()
+                continue
+
+            self._processed_pages.add(url)
+
+            self._page_index += 1
+
+            if lastmod and self.page_store is not None and self._reuse_page(url, lastmod):
+                await self._page_done()
+                continue
+
+            await self._wait_for_host(url)
+
+            logger.info(f"Checking {'discovered page' if depth else 'sitemap-url'} #{self._page_index}: {url}")
+
+            try:
+                with self.stage_timer.measure("fetch"):
+                    response, content = await self._run_blocking(self._fetch_page, url)
+
+            except requests.exceptions.RequestException as e:
+                # timeouts and pages exceeding the body budget are reported as broken
+                logger.error(f"Error while fetching page: {url} - {e}")
+                self._add_fetched_page(url, depth, LinkStatus.ERROR)
+                self.checkpoint.add_page(url, LinkStatus.ERROR, [], depth=depth)
+                await self._page_done()
+                continue
+
+            self.rate_limiter.report(urlparse(url).netloc, response.status_code, response.headers.get("Retry-After"))
+
+            self._add_fetched_page(url, depth, response.status_code)
+
+            if content is None:
+                # an error page or a document which is not html, e.g. a pdf
+                self.checkpoint.add_page(url, response.status_code, [], depth=depth)
+                await self._page_done()
+                continue
+
+            # only an explicit charset counts, requests falls back to ISO-8859-1 for every text/* response without one
+            encoding = response.encoding if "charset" in response.headers.get("Content-Type", "").lower() else None
+            await pages.put((url, depth, lastmod, content, encoding))
+
+    async def _parse_pages(self, pages: asyncio.Queue, parsed_pages: asyncio.Queue, parser_pool):
+        """ Pipeline stage 2: extracts the links and anchors of the fetched pages in the parser processes. """
+        loop = asyncio.get_running_loop()
+
+        while (page := await pages.get()) is not None:
+            url, depth, lastmod, content, encoding = page
+
+            try:
+                with self.stage_timer.measure("parse"):
+                    parsed_page = await loop.run_in_executor(parser_pool, parse_page, content, encoding)
+
+            except Exception as e:
+                # the page is finished without links and without lastmod, so that it is not stored for the next run
+                logger.error(f"Error while parsing page: {url} - {e}")
+                parsed_page = ParsedPage(links=[], anchors=[])
+                lastmod = None
+
+            await parsed_pages.put((url, depth, lastmod, parsed_page))
+
+    async def _check_parsed_pages(self, parsed_pages: asyncio.Queue):
+        """ Pipeline stage 3: schedules the link checks of the parsed pages on the async engine. """
+        while (parsed_page := await parsed_pages.get()) is not None:
+            url, depth, lastmod, page = parsed_page
+            self._add_page_links(url, depth, page.links, page.anchors)
+
+            if lastmod and self.page_store is not None:
+                self.page_store.store_page(self.site_name, url, lastmod, page.links, page.anchors)
+
+            await self._page_done()
+
+    async def _run_pipeline(self, sitemap_urls, parser_pool):
+        """ Connects the fetch, parse and check stages with bounded queues, so that parsing does not block the network
+        requests and no stage can run too far ahead of the others.
+        """
+        pages = asyncio.Queue(maxsize=2 * self.parser_workers)
+        parsed_pages = asyncio.Queue(maxsize=2 * self.parser_workers)
+
+        async def fetch():
+            await asyncio.gather(*[self._fetch_pages(sitemap_urls, pages) for _ in range(self.per_host_concurrency)])
+
+            for _ in range(self.parser_workers):
+                await pages.put(None)
+
+        async def parse():
+            await asyncio.gather(*[self._parse_pages(pages, parsed_pages, parser_pool) for _ in range(self.parser_workers)])
+            await parsed_pages.put(None)
+
+        await asyncio.gather(fetch(), parse(), self._check_parsed_pages(parsed_pages))
+
+    def _export_metrics(self):
+        """ Writes the Prometheus textfile and the JSON summary of the metrics collected so far. """
+        metrics_path = Path(self.metrics_path) if self.metrics_path else self.report_printer.output_path
+
+        self.metrics.export(metrics_path, link_counts={
+            category.value: len(self.link_registry.records(category)) for category in LinkCategory
+        })
+
+    async def _export_metrics_periodically(self):
+        while True:
+            await asyncio.sleep(self.metrics_export_interval)
+            await self._run_blocking(self._export_metrics)
 
     def check_website_health(self):
+        """ Checks a single website. The link cache, page store and http client are closed afterwards, also if the main
+        url could not be reached, which removes the DNS cache from the process again.
+        """
+        try:
+            asyncio.run(self._check_website_health())
+        finally:
+            # keeps the state recorded so far if the crawl died, a finished crawl has already removed its checkpoint
+            self.checkpoint.close()
+            self.link_cache.close()
+
+            if self.page_store is not None:
+                self.page_store.close()
+
+            self.http_client.close()
+
+    async def _check_website_health(self):
+        # one extra worker per page fetcher is reserved for fetching the sitemap pages next to the link checks
+        # the pages are parsed in separate processes so that parsing does not hold the GIL of the network stages
+        with ThreadPoolExecutor(max_workers=self.worker_threads) as executor, \
+                ProcessPoolExecutor(max_workers=self.parser_workers, mp_context=multiprocessing.get_context("spawn")) as parser_pool:
+            reachable = await self.crawl(executor, parser_pool)
+
+        if reachable:
+            self.write_report()
+
+    @property
+    def worker_threads(self):
+        """ The number of threads needed to run the blocking requests of a crawl. """
+        return self.concurrency + self.per_host_concurrency + 1
+
+    async def crawl(self, executor: ThreadPoolExecutor, parser_pool: ProcessPoolExecutor) -> bool:
+        """ Crawls the website using the given worker threads and parser processes, which can be shared with the
+        crawls of other websites running in the same event loop.
+        :return: False if the main url could not be reached, True otherwise
+        """
+        self._executor = executor
+        self._request_slots = asyncio.Semaphore(self.concurrency)
+        self._sitemap_lock = asyncio.Lock()
+        self._frontier_changed = asyncio.Condition()
+        self._page_index = -1
+
         logger.info(f"Checking reachability of main url: {self.main_url}")
 
-        response = requests.get(self.main_url, headers=self.HEADERS)
+        try:
+            # only the status is needed, the body of the main url is fetched again as a sitemap page
+            response = await self._run_blocking(self.http_client.get, self.main_url, stream=True)
+            response.close()
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Main URL could not be reached: {e}")
+            return False
 
-        main_url_record = LinkRecord(link=self.main_url, found_in_page=["Main URL"], resource_type=LinkType.LINK, status_code=response.status_code)
+        main_url_record = LinkRecord(link=self.main_url, resource_type=LinkType.LINK, status_code=response.status_code)
 
         if response.status_code != 200:
             logger.info(f"Main URL could not be reached!")
-            return
-        
-        self.working_links.append(main_url_record)
+            return False
 
-        sitemap_urls = get_sitemap_urls(self.main_url)
+        self.link_registry.add(main_url_record, LinkCategory.WORKING, found_in="Main URL")
 
-        for index, url in enumerate(sitemap_urls):
-            time.sleep(1)
+        metrics_exporter = asyncio.create_task(self._export_metrics_periodically()) if self.metrics_export_interval else None
 
-            if index < 4:
-                pass
-                # continue
-                
-            if index > 5:
-                pass
-                # break
+        checkpoint_state = self.checkpoint.load() if self.resume else None
+        self.checkpoint.open(resume=checkpoint_state is not None)
+        checkpoint_writer = asyncio.create_task(self._flush_checkpoint_periodically())
+        sitemap_urls = None
 
-            logger.info(f"Checking sitemap-url #{index}: {url}")
-            response = requests.get(url, headers=self.HEADERS)
+        try:
+            async with asyncio.timeout(self.crawl_deadline or None) as deadline:
+                if self.discover:
+                    self._start_discovery()
 
-            sitemap_link_record = LinkRecord(link=url, found_in_page=["Sitemap"], resource_type=LinkType.LINK, status_code=response.status_code)
+                if checkpoint_state:
+                    self._resume_from_checkpoint(checkpoint_state)
 
-            if response.status_code != 200:
-                self.broken_links.append(sitemap_link_record)
-                continue
+                # the sitemap urls are streamed in while the crawl is already running
+                sitemap_urls = get_sitemap_urls(self.main_url, self.http_client, workers=self.config.get("sitemap_workers", 4))
 
-            self.working_links.append(sitemap_link_record)
+                await self._run_pipeline(sitemap_urls, parser_pool)
 
-            soup = BeautifulSoup(response.content, features="html.parser")
+                # wait for all scheduled link checks to finish
+                await self._wait_for_link_checks()
 
-            links = extract_links_in_page(soup)
-            scripts, images, other_links = extract_resources_in_page(soup)
+        except TimeoutError:
+            if not deadline.expired():
+                raise
 
-            for link in links:
-                self._check_link_health(url, link, LinkType.LINK)
+            await self._stop_at_deadline()
 
-            for script in scripts:
-                self._check_link_health(url, script, LinkType.SCRIPT)
+        finally:
+            if metrics_exporter:
+                metrics_exporter.cancel()
 
-            for image in images:
-                self._check_link_health(url, image, LinkType.IMAGE)
+            checkpoint_writer.cancel()
 
-            for other_link in other_links:
-                self._check_link_health(url, other_link, LinkType.OTHER_LINK)
-            
-        self.report_printer.print_report(
-            broken_links=self.broken_links,
-            working_links=self.working_links,
-            redirected_links=self.redirected_links
-        )
-        return
-    
\ No newline at end of file
+            if sitemap_urls is not None:
+                self._close_sitemap_urls(sitemap_urls)
+
+        if self._pending_fragments:
+            logger.info(f"Fragments of links to {len(self._pending_fragments)} pages that are not in the sitemap were not validated")
+            self._pending_fragments.clear()
+
+        if self.page_store is not None:
+            logger.info(f"Reused the stored links of {self.reused_pages} unchanged sitemap pages")
+
+        if self.frontier is not None:
+            logger.info(f"Crawled {len(self._processed_pages)} pages in discovery mode, {self.frontier.dropped} discovered pages were not "
+                        f"crawled because of discovery_max_pages")
+
+        return True
+
+    async def _stop_at_deadline(self):
+        """ Cancels the link checks still running when the crawl deadline is reached. Their records stay pending and are
+        reported as unchecked links, the checkpoint is kept so that the crawl can be continued with --resume.
+        """
+        self.deadline_reached = True
+
+        for task in self._link_tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._link_tasks, return_exceptions=True)
+
+        logger.warning(f"Crawl deadline of {self.crawl_deadline} seconds reached after {len(self._processed_pages)} pages, "
+                       f"{len(self.link_registry.pending_links)} links were not checked")
+
+    @staticmethod
+    def _close_sitemap_urls(sitemap_urls):
+        """ Stops the sitemap readers of a crawl that did not read all sitemap urls. """
+        try:
+            sitemap_urls.close()
+        except ValueError:
+            # still advanced by a worker thread, the generator is closed when it is garbage collected
+            pass
+
+    def _compare_with_last_run(self) -> Optional[RunDiff]:
+        """ Compares the link results with the last run and stores them for the next one, unless the crawl is partial. """
+        run_diff = self.page_store.compare(self.site_name, self.link_registry)
+
+        if run_diff is None:
+            logger.info(f"No previous run of {self.site_name} found, the next incremental run is compared with this one")
+        else:
+            logger.info(f"Since the run of {run_diff.previous_run:%Y-%m-%d %H:%M}: {len(run_diff.newly_broken)} newly broken, "
+                        f"{len(run_diff.newly_fixed)} newly fixed and {len(run_diff.new_links)} new links")
+
+        if not self.deadline_reached:
+            self.page_store.save_results(self.site_name)
+
+        return run_diff
+
+    def write_report(self):
+        """ Writes the report and the metrics of a crawl. The checkpoint of a finished crawl is removed, a crawl stopped
+        at its deadline keeps it for --resume. In incremental mode the report lists the changes since the last run.
+        """
+        self.http_client.log_statistics()
+
+        with self.stage_timer.measure("report"):
+            run_diff = self._compare_with_last_run() if self.page_store is not None else None
+
+            self.report_printer.print_report(
+                broken_links=self.link_registry.broken_links,
+                working_links=self.link_registry.working_links,
+                redirected_links=self.link_registry.redirected_links,
+                missing_anchors=self.link_registry.records(LinkCategory.MISSING_ANCHOR),
+                pages=self.link_registry.pages,
+                slow_links=sorted(self.slow_links, key=lambda record: record.response_time, reverse=True),
+                host_latency=self.host_latency,
+                unchecked_links=self.link_registry.pending_links if self.deadline_reached else None,
+                run_diff=run_diff
+            )
+
+        self.checkpoint.close(remove=not self.deadline_reached)
+
+        if self.deadline_reached:
+            logger.info("The report is partial, continue the crawl with --resume")
+
+        self._export_metrics()
+        logger.info(f"Metrics written to {Path(self.metrics_path) if self.metrics_path else self.report_printer.output_path}")
@@ -0,0 +1,244 @@
+""" This module holds the shared http client. All requests of a run (sitemap discovery, page crawl and link checks) go
+through one pooled requests.Session, so connections and TLS sessions to a host are reused instead of being opened
+for every single request. Every request has a connect and read timeout and bodies are only read within a size and
+time budget, so that a single slow or tarpitting host can not hang a run. """
+
+from typing import Dict, Optional, Sequence
+
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from src.dns_cache import DnsCache
+from src.metrics import CrawlMetrics
+
+
+# (connect, read) timeout in seconds of requests that do not set their own timeout
+DEFAULT_TIMEOUT = (5, 30)
+
+# bodies are read in chunks of this size, so that the budget is checked while reading
+BODY_CHUNK_SIZE = 64 * 1024
+
+
+class BodyBudgetExceeded(requests.exceptions.RequestException):
+    """ The body of a response was larger or took longer to read than the budget of the http client allows. """
+
+
+def _bytes_received(response: requests.Response) -> int:
+    """ The number of body bytes read from the connection so far, before decompression. """
+    try:
+        return response.raw.tell()
+    except (AttributeError, OSError):
+        return 0
+
+
+def _counting_pool_class(pool_class, on_connect):
+    """ Returns a subclass of a urllib3 connection pool whose connections call on_connect for every connection they
+    open. A pooled connection object reconnects once its socket has been dropped, so the connection objects of a pool
+    do not tell how many TCP (and TLS) handshakes were made.
+    """
+    class CountingConnection(pool_class.ConnectionCls):
+        def connect(self):
+            super().connect()
+            on_connect()
+
+    return type(pool_class.__name__, (pool_class,), {"ConnectionCls": CountingConnection})
+
+
+@dataclass
+class PoolStatistics:
+    """ Statistics about the connection reuse of the http client. """
+    requests: int
+    # every new connection costs a TCP (and for https a TLS) handshake
+    connections_opened: int
+    # share of requests that were sent over an already open connection
+    reuse_rate: float
+
+
+class HttpClient:
+    """ Thread safe pooled http client shared by all stages of a run.
+    :param headers: dict - headers sent with every request
+    :param pool_hosts: int - the number of hosts a connection pool is kept for
+    :param pool_size_per_host: int - the number of connections kept open per host
+    :param max_connections: int - the maximum number of connections in use overall, a streamed response uses its
+        connection until it is closed. None for no limit
+    :param metrics: CrawlMetrics - records latency, bytes and status of every request, None to disable
+    :param timeout: tuple - (connect, read) timeout in seconds of requests that do not set their own timeout. The read
+        timeout applies to each read from the socket, not to the whole response.
+    :param max_body_bytes: int - the maximum size of a body read with read_body()
+    :param max_body_read_time: float - the maximum time in seconds to read a body with read_body()
+    :param dns_cache: DnsCache - installed while the client is open, None to resolve every connection with the system resolver
+    """
+
+    def __init__(self, headers: Dict[str, str] = None, pool_hosts: int = 100, pool_size_per_host: int = 10, max_connections: Optional[int] = None,
+                 metrics: Optional[CrawlMetrics] = None, timeout: Sequence[float] = DEFAULT_TIMEOUT, max_body_bytes: int = 10 * 1024 * 1024,
+                 max_body_read_time: float = 60, dns_cache: Optional[DnsCache] = None):
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+        self.adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size_per_host)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._connection_slots = threading.BoundedSemaphore(max_connections) if max_connections else None
+        self.metrics = metrics
+
+        self.timeout = tuple(timeout)
+        self.max_body_bytes = max_body_bytes
+        self.max_body_read_time = max_body_read_time
+
+        self.dns_cache = dns_cache
+
+        if self.dns_cache:
+            self.dns_cache.install()
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._connections_opened = 0
+
+        poolmanager = self.adapter.poolmanager
+        poolmanager.pool_classes_by_scheme = {
+            scheme: _counting_pool_class(pool_class, self._on_connect) for scheme, pool_class in poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def _on_connect(self):
+        with self._lock:
+            self._connections_opened += 1
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """ Sends a request within the max_connections limit. A streamed response keeps its connection checked out
+        while the body is read, so its slot is only released when the response is closed.
+        """
+        if self._connection_slots is None:
+            return self.session.request(method, url, **kwargs)
+
+        self._connection_slots.acquire()
+
+        try:
+            response = self.session.request(method, url, **kwargs)
+
+        except BaseException:
+            self._connection_slots.release()
+            raise
+
+        if not kwargs.get("stream", False):
+            self._connection_slots.release()
+            return response
+
+        close = response.close
+        released = threading.Event()
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                # a response may be closed more than once, e.g. by read_body() and a surrounding with block
+                if not released.is_set():
+                    released.set()
+                    self._connection_slots.release()
+
+        response.close = close_and_release
+        return response
+
+    def _record(self, host: str, duration: float, response: requests.Response, stream: bool):
+        """ Records the request in the metrics. The body of a streamed response is only counted when the response
+        is closed, as far as it has been read by then. """
+        if not stream:
+            self.metrics.record_request(host, duration, response.status_code, _bytes_received(response))
+            return
+
+        self.metrics.record_request(host, duration, response.status_code)
+        close = response.close
+
+        def close_and_record():
+            if not getattr(response, "_bytes_recorded", False):
+                response._bytes_recorded = True
+                self.metrics.record_bytes(host, _bytes_received(response))
+
+            close()
+
+        response.close = close_and_record
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        with self._lock:
+            self._requests += 1
+
+        if self.metrics is None:
+            return self._send(method, url, **kwargs)
+
+        host = urlparse(url).netloc
+        start = time.perf_counter()
+
+        try:
+            response = self._send(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.metrics.record_request(host, time.perf_counter() - start, None)
+            raise
+
+        self._record(host, time.perf_counter() - start, response, kwargs.get("stream", False))
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def read_body(self, response: requests.Response) -> bytes:
+        """ Reads the body of a streamed response and closes it. The read timeout of a request does not stop a server
+        which sends a few bytes at a time, so the size and the total read time of the body are limited as well.
+        Raises BodyBudgetExceeded if the body is larger or takes longer to read than the budget allows.
+        """
+        with response:
+            content_length = response.headers.get("Content-Length", "")
+
+            if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+                raise BodyBudgetExceeded(f"The body of {response.url} has {content_length} bytes, more than the limit of {self.max_body_bytes}")
+
+            deadline = time.monotonic() + self.max_body_read_time
+            chunks = []
+            size = 0
+
+            for chunk in response.iter_content(BODY_CHUNK_SIZE):
+                size += len(chunk)
+
+                if size > self.max_body_bytes:
+                    raise BodyBudgetExceeded(f"The body of {response.url} is larger than the limit of {self.max_body_bytes} bytes")
+
+                if time.monotonic() > deadline:
+                    raise BodyBudgetExceeded(f"The body of {response.url} could not be read within {self.max_body_read_time} seconds")
+
+                chunks.append(chunk)
+
+            return b"".join(chunks)
+
+    def get_statistics(self) -> PoolStatistics:
+        with self._lock:
+            connections_opened = self._connections_opened
+            requests_sent = self._requests
+
+        reuse_rate = 1 - connections_opened / requests_sent if requests_sent else 0
+
+        return PoolStatistics(requests=requests_sent, connections_opened=connections_opened, reuse_rate=max(0.0, reuse_rate))
+
+    def log_statistics(self):
+        statistics = self.get_statistics()
+        logger.info(f"HTTP pool: {statistics.requests} requests over {statistics.connections_opened} connections "
+                    f"({statistics.reuse_rate:.1%} reused)")
+
+        if self.dns_cache:
+            self.dns_cache.log_statistics()
+
+    def close(self):
+        self.session.close()
+
+        if self.dns_cache:
+            self.dns_cache.uninstall()
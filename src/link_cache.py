@@ -0,0 +1,113 @@
+""" This module holds the persistent link cache. It stores the probe result of each checked url in a SQLite database,
+so that following runs do not have to check unchanged links again. Expired entries are revalidated with conditional
+requests (If-None-Match / If-Modified-Since) which are answered with a body-less 304 if nothing changed. """
+
+from typing import Dict, Optional, Tuple
+
+import sqlite3
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from src.data_objects import LinkType
+from src.link_prober import ProbeResult
+from src.rate_limiter import BACKOFF_STATUS_CODES
+
+
+class LinkCache:
+    """ SQLite backed cache of probe results.
+    :param database_path: Path - the SQLite file, its folder is created if needed
+    :param ttl: dict - maps LinkType values (e.g. "Image") and "default" to the number of seconds an entry is used without revalidation
+    :param domain_ttl: dict - maps domains to a ttl in seconds, overrides the ttl of the link type. Subdomains are matched as well.
+    """
+
+    # number of writes after which the changes are committed to disk
+    COMMIT_INTERVAL = 100
+
+    def __init__(self, database_path: Path, ttl: Dict[str, int] = None, domain_ttl: Dict[str, int] = None):
+        self.database_path = database_path
+
+        ttl = ttl or {}
+        self.default_ttl = ttl.get("default", 0)
+        self.ttl: Dict[LinkType, int] = {LinkType(key): value for key, value in ttl.items() if key != "default"}
+        self.domain_ttl = domain_ttl or {}
+
+        if not self.database_path.parent.exists():
+            self.database_path.parent.mkdir()
+
+        self.connection = sqlite3.connect(self.database_path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS links (
+                url TEXT PRIMARY KEY,
+                status_code INTEGER NOT NULL,
+                redirect_status_code INTEGER,
+                final_url TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+        self._pending_writes = 0
+
+    def get_ttl(self, url: str, link_type: LinkType) -> int:
+        """ Returns the ttl in seconds for the given url. Domain ttls take precedence over link type ttls. """
+        host = (urlparse(url).hostname or "").lower()
+
+        for domain, ttl in self.domain_ttl.items():
+            if host == domain or host.endswith("." + domain):
+                return ttl
+
+        return self.ttl.get(link_type, self.default_ttl)
+
+    def get(self, url: str) -> Optional[Tuple[ProbeResult, float]]:
+        """ Returns the cached probe result of the url and the time it was checked at, or None if it is unknown. """
+        row = self.connection.execute(
+            "SELECT status_code, redirect_status_code, final_url, etag, last_modified, checked_at FROM links WHERE url = ?",
+            (url,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        status_code, redirect_status_code, final_url, etag, last_modified, checked_at = row
+
+        probe_result = ProbeResult(
+            status_code=status_code,
+            redirect_status_code=redirect_status_code,
+            final_url=final_url,
+            method="CACHE",
+            etag=etag,
+            last_modified=last_modified
+        )
+        return probe_result, checked_at
+
+    def is_fresh(self, url: str, link_type: LinkType, checked_at: float) -> bool:
+        return time.time() - checked_at < self.get_ttl(url, link_type)
+
+    def store(self, url: str, probe_result: ProbeResult):
+        """ Stores the probe result of the url. Results of an overloaded or failing server (429, 5xx) are temporary and
+        not stored, otherwise a single outage would be replayed as broken link for the whole ttl without any request.
+        """
+        if probe_result.status_code in BACKOFF_STATUS_CODES or probe_result.status_code >= 500:
+            return
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, probe_result.status_code, probe_result.redirect_status_code, probe_result.final_url,
+             probe_result.etag, probe_result.last_modified, time.time())
+        )
+
+        self._pending_writes += 1
+
+        if self._pending_writes >= self.COMMIT_INTERVAL:
+            self.connection.commit()
+            self._pending_writes = 0
+
+    def close(self):
+        logger.info(f"Saving link cache to {self.database_path}")
+        self.connection.commit()
+        self.connection.close()
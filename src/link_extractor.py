@@ -1,6 +1,22 @@
 """This module contains functions to extract links and resources such as scripts and images from a given html webpage."""
 
+from typing import List, Optional, Tuple
+
+import codecs
+import re
+
 from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+from lxml import etree
+
+from src.data_objects import LinkType, ParsedPage
+
+
+# url("...") references in inline css, e.g. background images or fonts
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(['"]?)(.*?)\1\s*\)""", re.IGNORECASE)
+
+# the url of a single image candidate in a srcset attribute, see https://html.spec.whatwg.org/#parse-a-srcset-attribute
+SRCSET_URL_PATTERN = re.compile(r"[\s,]*(\S*)")
 
 
 def extract_links_in_page(soup: BeautifulSoup):
@@ -28,3 +44,149 @@ def extract_resources_in_page(soup: BeautifulSoup):
         images.append(resource.get('src'))
 
     return scripts, images, links
+
+
+def parse_srcset(srcset: str) -> List[str]:
+    """ Returns the urls of all image candidates in a srcset attribute, e.g. "a.png 1x, b.png 2x" -> ["a.png", "b.png"]
+    Commas inside urls (e.g. data: urls) are handled like browsers do.
+    """
+    urls = []
+    position = 0
+
+    while position < len(srcset):
+        match = SRCSET_URL_PATTERN.match(srcset, position)
+        url = match.group(1)
+        position = match.end()
+
+        if not url:
+            break
+
+        if url.endswith(","):
+            # a candidate without descriptors
+            url = url.rstrip(",")
+
+        else:
+            # skip the descriptors (e.g. "2x" or "300w") up to the next candidate
+            next_candidate = srcset.find(",", position)
+            position = len(srcset) if next_candidate == -1 else next_candidate + 1
+
+        if url:
+            urls.append(url)
+
+    return urls
+
+
+def parse_css_urls(css: str) -> List[str]:
+    """ Returns all url(...) references of a piece of css. """
+    return [match.group(2).strip() for match in CSS_URL_PATTERN.finditer(css) if match.group(2).strip()]
+
+
+class _LinkCollector:
+    """ lxml parser target that collects all links of a page in a single pass while the page is parsed,
+    without building a document tree.
+    """
+
+    # (tag, attribute) -> link type of single url attributes
+    URL_ATTRIBUTES = {
+        ("a", "href"): LinkType.LINK,
+        ("link", "href"): LinkType.OTHER_LINK,
+        ("script", "src"): LinkType.SCRIPT,
+        ("img", "src"): LinkType.IMAGE,
+        ("iframe", "src"): LinkType.FRAME,
+        ("video", "src"): LinkType.MEDIA,
+        ("video", "poster"): LinkType.IMAGE,
+        ("audio", "src"): LinkType.MEDIA,
+        ("source", "src"): LinkType.MEDIA,
+        ("track", "src"): LinkType.MEDIA,
+    }
+
+    # tags whose srcset attribute lists image candidates
+    SRCSET_TAGS = {"img", "source"}
+
+    def __init__(self):
+        self.links: List[Tuple[str, LinkType]] = []
+        # targets of #fragment links: the id of any element and the name of <a> elements
+        self.anchors: List[str] = []
+        self._style_text = None
+
+    def start(self, tag, attrib):
+        for attribute, value in attrib.items():
+            link_type = self.URL_ATTRIBUTES.get((tag, attribute))
+
+            if link_type is not None:
+                self.links.append((value, link_type))
+
+            elif attribute == "id" or (attribute == "name" and tag == "a"):
+                self.anchors.append(value)
+
+            elif attribute == "srcset" and tag in self.SRCSET_TAGS:
+                self.links.extend((url, LinkType.IMAGE) for url in parse_srcset(value))
+
+            elif attribute == "style" and "url(" in value:
+                self.links.extend((url, LinkType.OTHER_LINK) for url in parse_css_urls(value))
+
+        if tag == "style":
+            self._style_text = []
+
+    def data(self, data):
+        if self._style_text is not None:
+            self._style_text.append(data)
+
+    def end(self, tag):
+        if tag == "style" and self._style_text is not None:
+            self.links.extend((url, LinkType.OTHER_LINK) for url in parse_css_urls("".join(self._style_text)))
+            self._style_text = None
+
+    def close(self):
+        return ParsedPage(links=self.links, anchors=self.anchors)
+
+
+def detect_encoding(html: bytes) -> Optional[str]:
+    """ Detects the encoding of a page served without a charset. A byte order mark or a <meta charset> is left to lxml
+    (None), otherwise the page is decoded as UTF-8 if it is valid UTF-8 and as windows-1252 like browsers do if not.
+    """
+    if html.startswith((codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)) or EncodingDetector.find_declared_encoding(html, is_html=True):
+        return None
+
+    try:
+        html.decode("utf-8")
+        return "utf-8"
+
+    except UnicodeDecodeError:
+        return "windows-1252"
+
+
+def parse_page(html: bytes, encoding: Optional[str] = None) -> ParsedPage:
+    """ Extracts all links and resources of a page in a single streaming pass as (url, LinkType) pairs in document
+    order, together with the anchors of the page. Besides a, link, script and img tags this covers srcset, source,
+    iframe, video, audio and url() references in inline css.
+    :param encoding: the charset of the Content-Type header, if the page has none it is detected (see detect_encoding)
+    """
+    if encoding is not None:
+        try:
+            # libxml2 does not know all aliases of Python, e.g. latin_1 for iso8859-1
+            encoding = codecs.lookup(encoding).name
+        except LookupError:
+            encoding = None
+
+    collector = _LinkCollector()
+
+    try:
+        parser = etree.HTMLParser(target=collector, encoding=encoding or detect_encoding(html))
+
+    except LookupError:
+        # a charset Python knows but libxml2 does not, e.g. mac-roman or cp037
+        parser = etree.HTMLParser(target=collector, encoding=detect_encoding(html))
+
+    try:
+        parser.feed(html)
+        return parser.close()
+
+    except etree.LxmlError:
+        # e.g. an empty document - return what has been found so far
+        return ParsedPage(links=collector.links, anchors=collector.anchors)
+
+
+def extract_page_links(html: bytes) -> List[Tuple[str, LinkType]]:
+    """ Extracts all links and resources of a page, see parse_page. """
+    return parse_page(html).links
@@ -0,0 +1,152 @@
+""" This module holds the link prober. It finds out the status of a link while transferring as little data as possible:
+instead of downloading the whole body, a HEAD request is sent first and only if the server does not support HEAD,
+a streamed GET request is used which is closed as soon as the headers have been received. """
+
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import enum
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from src.data_objects import LinkType
+from src.http_client import HttpClient
+from src.rate_limiter import BACKOFF_STATUS_CODES
+
+
+# a link is defined as not to be broken if it returns 200, 400 or 403 (999 is used by linkedin to block scraping)
+# 403 is used as a workaround, since this is usually caused by calling the page with python requests
+ACCEPTED_STATUS_CODES = [200, 400, 403, 999]
+
+# status code of a conditional request if the resource has not changed
+NOT_MODIFIED_STATUS_CODE = 304
+
+# status codes a server answers with if it does not support HEAD requests
+HEAD_NOT_SUPPORTED_STATUS_CODES = [405, 501]
+
+
+class ProbeStrategy(enum.Enum):
+    HEAD = "head"
+    """ HEAD request, falls back to a streamed GET if the server does not support HEAD """
+    STREAM = "stream"
+    """ GET request that is closed as soon as the headers have been received """
+    GET = "get"
+    """ GET request that downloads the whole body """
+
+
+@dataclass
+class ProbeResult:
+    """ The outcome of probing a single link. """
+    status_code: int
+    # status code of the first redirect, None if the link was not redirected
+    redirect_status_code: Optional[int]
+    final_url: str
+    method: str
+    # validators used to revalidate the result with a conditional request later on
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Retry-After header of 429/503 responses
+    retry_after: Optional[str] = None
+
+
+class LinkProber:
+    """ Requests links using the configured ProbeStrategy per LinkType.
+    :param http_client: HttpClient - the shared http client used for all requests
+    :param strategies: dict - maps LinkType values (e.g. "Image") to ProbeStrategy values (e.g. "head")
+    :param head_unsupported_hosts: list - hosts that are known to reject HEAD requests
+    :param timeouts: dict - maps LinkType values to (connect, read) timeouts in seconds, the "default" entry applies to
+        all other types. Types without a timeout use the timeout of the http client.
+    """
+
+    DEFAULT_STRATEGY = ProbeStrategy.HEAD
+
+    def __init__(self, http_client: HttpClient, strategies: Dict[str, str] = None, head_unsupported_hosts: Iterable[str] = (),
+                 timeouts: Dict[str, Sequence[float]] = None):
+        self.http_client = http_client
+
+        timeouts = dict(timeouts or {})
+        default_timeout = timeouts.pop("default", None)
+        self.default_timeout: Optional[Tuple[float, float]] = tuple(default_timeout) if default_timeout else None
+        self.timeouts: Dict[LinkType, Tuple[float, float]] = {LinkType(link_type_value): tuple(timeout) for link_type_value, timeout in timeouts.items()}
+
+        self.strategies: Dict[LinkType, ProbeStrategy] = {}
+
+        for link_type_value, strategy_value in (strategies or {}).items():
+            self.strategies[LinkType(link_type_value)] = ProbeStrategy(strategy_value)
+
+        # hosts that answered a HEAD request with 405/501 are added during the run
+        self.head_unsupported_hosts = set(head_unsupported_hosts)
+
+    def get_strategy(self, link_type: LinkType) -> ProbeStrategy:
+        return self.strategies.get(link_type, self.DEFAULT_STRATEGY)
+
+    def get_timeout(self, link_type: LinkType) -> Optional[Tuple[float, float]]:
+        return self.timeouts.get(link_type, self.default_timeout)
+
+    def probe(self, url: str, link_type: LinkType, previous_result: Optional[ProbeResult] = None) -> ProbeResult:
+        """ Probes the given url. Raises requests.exceptions.RequestException if the link could not be requested at all.
+        :param previous_result: ProbeResult - an earlier result of the url. If it has an ETag or Last-Modified validator,
+            a conditional request is sent and a status code of 304 is returned if the resource did not change.
+        """
+        strategy = self.get_strategy(link_type)
+        timeout = self.get_timeout(link_type)
+
+        # the default headers are set on the session of the http client
+        headers = {}
+
+        if previous_result:
+            if previous_result.etag:
+                headers["If-None-Match"] = previous_result.etag
+
+            if previous_result.last_modified:
+                headers["If-Modified-Since"] = previous_result.last_modified
+
+        if strategy == ProbeStrategy.HEAD:
+            host = urlparse(url).netloc
+
+            if host not in self.head_unsupported_hosts:
+                result = self._request("HEAD", url, headers, timeout)
+
+                if result.status_code in HEAD_NOT_SUPPORTED_STATUS_CODES:
+                    logger.info(f"Host {host} does not support HEAD requests, falling back to GET")
+                    self.head_unsupported_hosts.add(host)
+
+                elif result.status_code in ACCEPTED_STATUS_CODES or result.status_code == NOT_MODIFIED_STATUS_CODE:
+                    return result
+
+                elif result.status_code in BACKOFF_STATUS_CODES:
+                    # the host wants us to slow down, a GET right away would ignore its Retry-After.
+                    # The rate limiter delays the retry of the link check instead.
+                    return result
+
+                # Some servers answer HEAD requests differently than GET requests (e.g. with 404).
+                # Broken links are rare, so they are confirmed with a streamed GET before being reported.
+
+            strategy = ProbeStrategy.STREAM
+
+        return self._request("GET", url, headers, timeout, read_body=strategy == ProbeStrategy.GET)
+
+    def _request(self, method: str, url: str, headers: Dict[str, str], timeout: Optional[Tuple[float, float]], read_body: bool = False) -> ProbeResult:
+        # a HEAD response has no body, so it is not streamed and its connection goes back to the pool right away
+        stream = method != "HEAD"
+
+        # HEAD requests do not follow redirects by default in requests
+        response = self.http_client.request(method, url, headers=headers, allow_redirects=True, stream=stream, timeout=timeout)
+
+        if read_body:
+            # the body is downloaded within the budget of the http client, a tarpitting server can not hang the check
+            self.http_client.read_body(response)
+        elif stream:
+            # closing a streamed response drops the connection before the body is downloaded
+            response.close()
+
+        return ProbeResult(
+            status_code=response.status_code,
+            redirect_status_code=response.history[0].status_code if response.history else None,
+            final_url=response.url,
+            method=method,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            retry_after=response.headers.get("Retry-After")
+        )
@@ -0,0 +1,304 @@
+""" This module holds the link registry. It resolves the links found in a page to canonical absolute urls and keeps
+exactly one LinkRecord per canonical url, so that looking up an already checked link never has to scan the result lists. """
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import asyncio
+from array import array
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from src.data_objects import LinkCategory, LinkRecord
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# links with these schemes can not be requested and are not checked at all
+IGNORED_SCHEMES = {"javascript", "data"}
+
+# links with these schemes are not resolved against the page they were found in
+OPAQUE_SCHEMES = {"mailto", "tel"}
+
+# the maximum length of a single label of a host name (RFC 1035)
+MAX_HOST_LABEL_LENGTH = 63
+
+
+def resolve_link(origin_page_url: str, link: str) -> Optional[str]:
+    """ Resolves a link found in a page to an absolute url the same way a browser does.
+    :param origin_page_url: str - the url of the page the link was found in
+    :param link: str - the raw href/src value
+    :return: the absolute url or None if the link can not be checked (javascript: and data: links).
+    A link urllib can not split, e.g. with an unclosed IPv6 bracket, is returned as it is (see is_valid_url).
+    """
+    link = link.strip()
+
+    if not link:
+        return None
+
+    try:
+        scheme = urlsplit(link).scheme.lower()
+
+        if scheme in IGNORED_SCHEMES:
+            return None
+
+        if scheme in OPAQUE_SCHEMES:
+            return link
+
+        return urljoin(origin_page_url, link)
+
+    except ValueError:
+        return link
+
+
+def is_valid_url(url: str) -> bool:
+    """ Returns whether the url can be requested at all. Urls with an unclosed IPv6 bracket, a port out of range or a
+    host with an empty label, a label over 63 characters or one that can not be IDNA encoded (e.g. www..example.com)
+    are reported as broken without a request.
+    """
+    try:
+        parts = urlsplit(url)
+        parts.port
+
+    except ValueError:
+        return False
+
+    host = parts.hostname
+
+    if not host or ":" in host:
+        # mailto: and tel: links have no host, IPv6 addresses have been validated by urllib already
+        return True
+
+    # a fully qualified host may end with a dot
+    labels = host[:-1].split(".") if host.endswith(".") else host.split(".")
+
+    for label in labels:
+        try:
+            encoded_label = label.encode("idna")
+
+        except UnicodeError:
+            return False
+
+        if not 1 <= len(encoded_label) <= MAX_HOST_LABEL_LENGTH:
+            return False
+
+    return True
+
+
+def normalize_url(url: str, keep_fragment: bool = False) -> str:
+    """ Returns the canonical form of an absolute url which is used as the registry key.
+    The scheme and host are lowercased, default ports and fragments (unless keep_fragment is set) are removed and
+    an empty path becomes "/".
+    Other trailing slashes are kept on purpose: "/blog" and "/blog/" are different urls and one of them
+    usually redirects, which is exactly what the report should show.
+    Invalid urls (see is_valid_url) are kept as they are, so that they do not collapse into the record of their host.
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+
+    if scheme not in DEFAULT_PORTS:
+        # mailto:, tel: and similar links are compared as they are
+        return url
+
+    host = (parts.hostname or "").lower()
+
+    if ":" in host:
+        # IPv6 addresses have to be put back into brackets
+        host = f"[{host}]"
+
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    if parts.username:
+        credentials = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        host = f"{credentials}@{host}"
+
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, parts.fragment if keep_fragment else ""))
+
+
+class PageIndex:
+    """ Interns page urls into integer ids. A record stores 4 bytes per page it was found in instead of a reference
+    to the url, and each page url is held in memory only once.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._urls: List[str] = []
+
+    def __len__(self):
+        return len(self._urls)
+
+    def id_of(self, url: str) -> int:
+        page_id = self._ids.get(url)
+
+        if page_id is None:
+            page_id = self._ids[url] = len(self._urls)
+            self._urls.append(url)
+
+        return page_id
+
+    def url_of(self, page_id: int) -> str:
+        return self._urls[page_id]
+
+    def urls_of(self, record: LinkRecord) -> List[str]:
+        """ Returns the urls of the pages the record was found in. """
+        if record.found_in is None:
+            return []
+
+        if isinstance(record.found_in, int):
+            return [self._urls[record.found_in]]
+
+        return [self._urls[page_id] for page_id in record.found_in]
+
+
+class CategoryView:
+    """ Live view of the records of one category. The records are indexed once by url only, so iterating a view scans
+    all records, while its size is kept up to date by the registry.
+    """
+
+    def __init__(self, records: Dict[str, LinkRecord], counts: Dict[LinkCategory, int], category: LinkCategory):
+        self._records = records
+        self._counts = counts
+        self._category = category
+
+    def __len__(self):
+        return self._counts[self._category]
+
+    def __iter__(self) -> Iterator[LinkRecord]:
+        category = self._category
+        return (record for record in self._records.values() if record.category == category)
+
+
+class LinkRegistry:
+    """ Holds one LinkRecord per canonical url and the number of records per LinkCategory.
+    All lookups, updates and category changes are O(1) amortized. The records of a category are not indexed
+    separately, a second index would hold another dict entry per record and the categories are only listed when the
+    report is written.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, LinkRecord] = {}
+        self._counts: Dict[LinkCategory, int] = {category: 0 for category in LinkCategory}
+        self.pages = PageIndex()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, url):
+        return normalize_url(url) in self._records
+
+    def get(self, url: str, keep_fragment: bool = False) -> Optional[LinkRecord]:
+        """ Returns the record of the url. Fragments are ignored, unless keep_fragment is set for records of a
+        specific fragment, e.g. links to a missing anchor.
+        """
+        if keep_fragment or "#" not in url:
+            # most links are found in their canonical form already, which saves normalizing them
+            record = self._records.get(url)
+
+            if record is not None:
+                return record
+
+        return self._records.get(normalize_url(url, keep_fragment))
+
+    def _add_page(self, record: LinkRecord, page: str):
+        """ Adds a page to the pages a record was found in. Most links are only found in a single page, so the id of
+        the first page is stored as it is, an array is only created for the second page.
+        """
+        page_id = self.pages.id_of(page)
+        found_in = record.found_in
+
+        if found_in is None:
+            record.found_in = page_id
+
+        elif isinstance(found_in, int):
+            if found_in != page_id:
+                record.found_in = array("I", (found_in, page_id))
+
+        # all links of a page are registered one after another, so a page can only be the last one of the list
+        elif found_in[-1] != page_id:
+            found_in.append(page_id)
+
+    def add_found_in(self, url: str, page: str, keep_fragment: bool = False) -> bool:
+        """ Adds the page to the pages an existing record was found in.
+        :return: True if the url was already known, False otherwise
+        """
+        record = self.get(url, keep_fragment)
+
+        if record is None:
+            return False
+
+        self._add_page(record, page)
+        return True
+
+    def add(self, record: LinkRecord, category: LinkCategory, found_in: str = None, keep_fragment: bool = False):
+        """ Adds a new record found in the given page. The record link is replaced with the canonical url. """
+        key = normalize_url(record.link, keep_fragment)
+        record.link = key
+        record.category = category
+
+        if found_in is not None:
+            self._add_page(record, found_in)
+
+        self._records[key] = record
+        self._counts[category] += 1
+
+    def set_category(self, record: LinkRecord, category: LinkCategory):
+        """ Moves a known record into another category, e.g. from pending to broken once its check is done. """
+        self._counts[record.category] -= 1
+        self._counts[category] += 1
+        record.category = category
+
+    def category_of(self, url: str) -> Optional[LinkCategory]:
+        record = self.get(url)
+        return record.category if record else None
+
+    def records(self, category: LinkCategory) -> CategoryView:
+        """ Returns a live view of all records in the given category in the order they were found. """
+        return CategoryView(self._records, self._counts, category)
+
+    @property
+    def working_links(self):
+        return self.records(LinkCategory.WORKING)
+
+    @property
+    def redirected_links(self):
+        return self.records(LinkCategory.REDIRECTED)
+
+    @property
+    def broken_links(self):
+        return self.records(LinkCategory.BROKEN)
+
+    @property
+    def pending_links(self):
+        return self.records(LinkCategory.PENDING)
+
+
+class SharedLinkResults:
+    """ Results of links shared by the health checks of several websites running in one event loop. Each entry is a
+    future resolving to the status code and category of the link, so a link can be awaited while it is still checked.
+    """
+
+    def __init__(self):
+        self._results: Dict[str, asyncio.Future] = {}
+
+    def __len__(self):
+        return len(self._results)
+
+    def claim(self, url: str) -> Tuple[asyncio.Future, bool]:
+        """ Returns the future of the url and whether the caller is the first to ask for it and has to check the link. """
+        key = normalize_url(url)
+
+        if key in self._results:
+            return self._results[key], False
+
+        result = asyncio.get_running_loop().create_future()
+        self._results[key] = result
+        return result, True
+
+    def release(self, url: str):
+        """ Gives up the claim of a url that will not be checked, the next website asking for it checks it instead. """
+        self._results.pop(normalize_url(url), None)
@@ -0,0 +1,254 @@
+""" This module holds the instrumentation of a crawl run. It records the wall time per stage, per host request latency
+histograms, transferred bytes and request counts, and exports them as a Prometheus textfile and a JSON summary. """
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+
+
+# upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_PREFIX = "website_health_checker"
+
+
+class StageTimer:
+    """ Accumulates the wall time spent in each stage of a run (sitemap, fetch, parse, check, report).
+    Stages running concurrently (e.g. many link checks) add up, so the time of a stage can exceed the total run time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+
+            with self._lock:
+                self.durations[stage] += duration
+                self.counts[stage] += 1
+
+    def snapshot(self) -> Dict[str, Tuple[float, int]]:
+        """ The duration and count of each stage, safe to read while stages are still running. """
+        with self._lock:
+            return {stage: (duration, self.counts[stage]) for stage, duration in self.durations.items()}
+
+
+class LatencyHistogram:
+    """ Histogram with fixed buckets like Prometheus uses them. Percentiles are interpolated within the buckets,
+    so memory does not grow with the number of observations.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        # the last count is the +Inf bucket
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.bucket_counts[index] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "LatencyHistogram"):
+        """ Adds the observations of a histogram with the same buckets. """
+        self.bucket_counts = [count + other_count for count, other_count in zip(self.bucket_counts, other.bucket_counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def percentile(self, quantile: float) -> float:
+        """ Estimates the given quantile (0.5 for p50) by linear interpolation within its bucket. """
+        if not self.count:
+            return 0.0
+
+        rank = quantile * self.count
+        cumulative = 0
+
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    # values above the largest bucket can not be estimated any closer
+                    return self.buckets[-1]
+
+                lower_bound = self.buckets[index - 1] if index else 0.0
+                return lower_bound + (self.buckets[index] - lower_bound) * (rank - cumulative) / bucket_count
+
+            cumulative += bucket_count
+
+        return self.buckets[-1]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomically(path: Path, content: str):
+    """ Writes the file next to its destination first, so that readers (e.g. the node exporter) never see half a file. """
+    temporary_path = path.with_name(path.name + ".tmp")
+
+    with open(temporary_path, "w") as file:
+        file.write(content)
+
+    os.replace(temporary_path, path)
+
+
+class CrawlMetrics:
+    """ Thread safe collection of all metrics of a run. """
+
+    def __init__(self):
+        self.stage_timer = StageTimer()
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        # periodic and final exports must not write the same files at the same time
+        self._export_lock = threading.Lock()
+        self.host_latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.host_requests: Dict[str, int] = defaultdict(int)
+        self.host_bytes: Dict[str, int] = defaultdict(int)
+        self.status_classes: Dict[str, int] = defaultdict(int)
+
+    def record_request(self, host: str, duration: float, status_code: Optional[int], bytes_received: int = 0):
+        """ Records a single http request. A status code of None means the request failed without a response. """
+        status_class = f"{status_code // 100}xx" if status_code else "error"
+
+        with self._lock:
+            self.host_latency[host].observe(duration)
+            self.host_requests[host] += 1
+            self.host_bytes[host] += bytes_received
+            self.status_classes[status_class] += 1
+
+    def record_bytes(self, host: str, bytes_received: int):
+        """ Adds bytes of a streamed response which are read after the request has been recorded. """
+        with self._lock:
+            self.host_bytes[host] += bytes_received
+
+    def summary(self, link_counts: Dict[str, int] = None) -> dict:
+        with self._lock:
+            hosts = {
+                host: {
+                    "requests": self.host_requests[host],
+                    "bytes": self.host_bytes[host],
+                    "p50_seconds": round(histogram.percentile(0.5), 4),
+                    "p95_seconds": round(histogram.percentile(0.95), 4),
+                    "p99_seconds": round(histogram.percentile(0.99), 4),
+                }
+                for host, histogram in self.host_latency.items()
+            }
+            status_classes = dict(self.status_classes)
+
+        return {
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "stages": {
+                stage: {"seconds": round(duration, 3), "count": count}
+                for stage, (duration, count) in self.stage_timer.snapshot().items()
+            },
+            "requests": sum(host["requests"] for host in hosts.values()),
+            "bytes": sum(host["bytes"] for host in hosts.values()),
+            "status_classes": status_classes,
+            "links": link_counts or {},
+            "hosts": hosts,
+        }
+
+    def to_prometheus(self, link_counts: Dict[str, int] = None) -> str:
+        """ Renders all metrics in the Prometheus text exposition format. """
+        lines: List[str] = []
+
+        def metric(name: str, metric_type: str, help_text: str):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+        metric("duration_seconds", "gauge", "Wall time of the run so far")
+        lines.append(f"{METRIC_PREFIX}_duration_seconds {time.time() - self.started_at:.3f}")
+
+        metric("stage_seconds_total", "counter", "Wall time spent per stage, summed over concurrent tasks")
+        for stage, (duration, _) in self.stage_timer.snapshot().items():
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_total{{stage="{stage}"}} {duration:.3f}')
+
+        with self._lock:
+            metric("requests_total", "counter", "Http requests per host")
+            for host, count in self.host_requests.items():
+                lines.append(f'{METRIC_PREFIX}_requests_total{{host="{_escape_label(host)}"}} {count}')
+
+            metric("response_bytes_total", "counter", "Bytes received per host")
+            for host, count in self.host_bytes.items():
+                lines.append(f'{METRIC_PREFIX}_response_bytes_total{{host="{_escape_label(host)}"}} {count}')
+
+            metric("responses_total", "counter", "Http responses per status class")
+            for status_class, count in self.status_classes.items():
+                lines.append(f'{METRIC_PREFIX}_responses_total{{status_class="{status_class}"}} {count}')
+
+            metric("request_duration_seconds", "histogram", "Http request latency per host")
+            for host, histogram in self.host_latency.items():
+                host_label = _escape_label(host)
+                cumulative = 0
+
+                for upper_bound, bucket_count in zip(histogram.buckets + ["+Inf"], histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{METRIC_PREFIX}_request_duration_seconds_bucket{{host="{host_label}",le="{upper_bound}"}} {cumulative}')
+
+                lines.append(f'{METRIC_PREFIX}_request_duration_seconds_sum{{host="{host_label}"}} {histogram.sum:.6f}')
+                lines.append(f'{METRIC_PREFIX}_request_duration_seconds_count{{host="{host_label}"}} {histogram.count}')
+
+        if link_counts:
+            metric("links", "gauge", "Checked links per category")
+            for category, count in link_counts.items():
+                lines.append(f'{METRIC_PREFIX}_links{{category="{category}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: Path, link_counts: Dict[str, int] = None):
+        """ Writes health_check_metrics.prom (for the node exporter textfile collector) and health_check_metrics.json. """
+        with self._export_lock:
+            if not directory.exists():
+                directory.mkdir(parents=True)
+
+            _write_atomically(directory.joinpath("health_check_metrics.prom"), self.to_prometheus(link_counts))
+            _write_atomically(directory.joinpath("health_check_metrics.json"), json.dumps(self.summary(link_counts), indent=4))
+
+
+def profile_run(func, output_path: Path, *args, **kwargs):
+    """ Runs the function under cProfile, writes the stats to output_path and logs the most expensive calls.
+    Only the calling thread is profiled, the request worker threads and parser processes are not.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        return func(*args, **kwargs)
+
+    finally:
+        profiler.disable()
+
+        if not output_path.parent.exists():
+            output_path.parent.mkdir(parents=True)
+
+        profiler.dump_stats(output_path)
+
+        stats_output = io.StringIO()
+        pstats.Stats(profiler, stream=stats_output).sort_stats("cumulative").print_stats(25)
+        logger.info(f"Profile written to {output_path}\n{stats_output.getvalue()}")
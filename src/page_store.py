@@ -0,0 +1,176 @@
+""" This module holds the page store of the incremental crawl. It keeps the <lastmod> date, the links and the anchors of
+every crawled sitemap page and which links were broken in the last run in a SQLite database. A following run
+with --incremental only fetches the sitemap pages whose lastmod changed and reuses the stored links of the others, and its
+report lists the links that broke, were fixed or are new since the last run. """
+
+from typing import List, Optional, Tuple
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from loguru import logger
+
+from src.data_objects import LinkCategory, LinkRecord, LinkType
+from src.link_registry import LinkRegistry
+
+
+# categories of a link that is broken, all other final categories count as working
+BROKEN_CATEGORIES = (LinkCategory.BROKEN, LinkCategory.MISSING_ANCHOR)
+
+
+@dataclass
+class RunDiff:
+    """ The changes of the link results since the previous run of a website. """
+    previous_run: datetime
+    # links that are broken now but were working in the previous run
+    newly_broken: List[LinkRecord] = field(default_factory=list)
+    # links that are working now but were broken in the previous run
+    newly_fixed: List[LinkRecord] = field(default_factory=list)
+    # links that were not found in the previous run
+    new_links: List[LinkRecord] = field(default_factory=list)
+
+
+class PageStore:
+    """ SQLite backed store of the sitemap pages and link results of the last run of each website. The connection is
+    shared by the crawls of a batch and used from the report threads as well, so all access is locked.
+    :param database_path: Path - the SQLite file, its folder is created if needed
+    """
+
+    # number of stored pages after which the changes are committed to disk
+    COMMIT_INTERVAL = 100
+
+    def __init__(self, database_path: Path):
+        self.database_path = database_path
+
+        if not self.database_path.parent.exists():
+            self.database_path.parent.mkdir()
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.database_path, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                site TEXT NOT NULL,
+                url TEXT NOT NULL,
+                lastmod TEXT NOT NULL,
+                links TEXT NOT NULL,
+                anchors TEXT NOT NULL,
+                PRIMARY KEY (site, url)
+            );
+            CREATE TABLE IF NOT EXISTS link_results (
+                site TEXT NOT NULL,
+                url TEXT NOT NULL,
+                broken INTEGER NOT NULL,
+                PRIMARY KEY (site, url)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                site TEXT PRIMARY KEY,
+                finished_at REAL NOT NULL
+            );
+            CREATE TEMP TABLE IF NOT EXISTS current_results (
+                site TEXT NOT NULL,
+                url TEXT NOT NULL,
+                broken INTEGER NOT NULL,
+                PRIMARY KEY (site, url)
+            );
+        """)
+        self.connection.commit()
+
+        self._pending_writes = 0
+
+    def get_page(self, site: str, url: str, lastmod: str) -> Optional[Tuple[List[Tuple[str, LinkType]], List[str]]]:
+        """ Returns the links and anchors of a page stored with the same lastmod, or None if the page changed or is unknown. """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT links, anchors FROM pages WHERE site = ? AND url = ? AND lastmod = ?",
+                (site, url, lastmod)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        links, anchors = row
+        return [(link, LinkType(link_type)) for link, link_type in json.loads(links)], json.loads(anchors)
+
+    def store_page(self, site: str, url: str, lastmod: str, links: List[Tuple[str, LinkType]], anchors: List[str]):
+        links = json.dumps([(link, link_type.value) for link, link_type in links], separators=(",", ":"))
+
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (site, url, lastmod, links, json.dumps(list(anchors), separators=(",", ":")))
+            )
+
+            self._pending_writes += 1
+
+            if self._pending_writes >= self.COMMIT_INTERVAL:
+                self.connection.commit()
+                self._pending_writes = 0
+
+    def compare(self, site: str, link_registry: LinkRegistry) -> Optional[RunDiff]:
+        """ Compares the checked links of the registry with the link results of the previous run. The comparison runs
+        in SQLite, so that only the changed links are held in memory. Pending links are left out.
+        :return: None if the website has no previous run
+        """
+        with self._lock:
+            self.connection.execute("DELETE FROM current_results WHERE site = ?", (site,))
+
+            for category in LinkCategory:
+                if category != LinkCategory.PENDING:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO current_results VALUES (?, ?, ?)",
+                        ((site, record.link, category in BROKEN_CATEGORIES) for record in link_registry.records(category))
+                    )
+
+            row = self.connection.execute("SELECT finished_at FROM runs WHERE site = ?", (site,)).fetchone()
+
+            if row is None:
+                return None
+
+            changed_links = """
+                SELECT current.url FROM current_results AS current
+                JOIN link_results AS previous ON previous.site = current.site AND previous.url = current.url
+                WHERE current.site = ? AND current.broken = ? AND previous.broken = ?
+                ORDER BY current.url
+            """
+
+            newly_broken = self.connection.execute(changed_links, (site, True, False)).fetchall()
+            newly_fixed = self.connection.execute(changed_links, (site, False, True)).fetchall()
+            new_links = self.connection.execute("""
+                SELECT url FROM current_results AS current WHERE site = ?
+                AND NOT EXISTS (SELECT 1 FROM link_results AS previous WHERE previous.site = current.site AND previous.url = current.url)
+                ORDER BY url
+            """, (site,)).fetchall()
+
+        def records(rows):
+            # the links to missing anchors are registered with their fragment
+            return [link_registry.get(url, keep_fragment=True) for url, in rows]
+
+        return RunDiff(
+            previous_run=datetime.fromtimestamp(row[0]),
+            newly_broken=records(newly_broken),
+            newly_fixed=records(newly_fixed),
+            new_links=records(new_links)
+        )
+
+    def save_results(self, site: str):
+        """ Replaces the stored link results of the website with the ones of the last compare(). Only the results of a
+        finished crawl are saved, a partial crawl would make all unchecked links count as new in the next run.
+        """
+        with self._lock:
+            self.connection.execute("DELETE FROM link_results WHERE site = ?", (site,))
+            self.connection.execute("INSERT INTO link_results SELECT site, url, broken FROM current_results WHERE site = ?", (site,))
+            self.connection.execute("DELETE FROM current_results WHERE site = ?", (site,))
+            self.connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?)", (site, time.time()))
+            self.connection.commit()
+
+    def close(self):
+        logger.info(f"Saving page store to {self.database_path}")
+
+        with self._lock:
+            self.connection.commit()
+            self.connection.close()
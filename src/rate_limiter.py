@@ -0,0 +1,121 @@
+""" This module holds the per host rate limiter. Each host gets its own token bucket, so politeness towards a fragile
+host does not slow down the requests to other hosts. The rate of a host is halved when it answers with 429 or 503,
+a Retry-After header pauses the host completely, and the rate recovers step by step while the host answers normally. """
+
+from typing import Dict, Optional
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from loguru import logger
+
+
+# status codes a host answers with if it is overloaded or wants the client to slow down
+BACKOFF_STATUS_CODES = [429, 503]
+
+
+def parse_retry_after(retry_after: Optional[str]) -> float:
+    """ Parses the value of a Retry-After header which is either a number of seconds or an HTTP date.
+    :return: the number of seconds to wait, 0 if the header is missing or invalid
+    """
+    if not retry_after:
+        return 0
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return 0
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class HostBucket:
+    """ The token bucket state of a single host. """
+    max_rate: float
+    rate: float
+    tokens: float
+    updated_at: float
+    blocked_until: float = 0
+    healthy_responses: int = 0
+
+
+class HostRateLimiter:
+    """ Adaptive token bucket rate limiter with one bucket per host.
+    :param default_rate: float - requests per second allowed per host if the host is not configured explicitly
+    :param host_rates: dict - maps hosts (e.g. "www.example.com") to their requests per second
+    :param burst: int - the number of requests a host may receive at once after being idle
+    """
+
+    # the rate of a host never drops below this fraction of its configured rate
+    MIN_RATE_FACTOR = 1 / 32
+
+    # number of healthy responses in a row after which the rate of a backed off host is increased again
+    RECOVERY_RESPONSES = 10
+
+    def __init__(self, default_rate: float = 1.0, host_rates: Dict[str, float] = None, burst: int = 1):
+        self.default_rate = default_rate
+        self.host_rates = host_rates or {}
+        self.burst = max(1, burst)
+
+        self.buckets: Dict[str, HostBucket] = {}
+
+    def _get_bucket(self, host: str) -> HostBucket:
+        if host not in self.buckets:
+            rate = self.host_rates.get(host, self.default_rate)
+            self.buckets[host] = HostBucket(max_rate=rate, rate=rate, tokens=self.burst, updated_at=time.monotonic())
+
+        return self.buckets[host]
+
+    def reserve(self, host: str) -> float:
+        """ Reserves a request to the given host.
+        :return: the number of seconds the caller has to wait before sending the request
+        """
+        bucket = self._get_bucket(host)
+        now = time.monotonic()
+
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * bucket.rate)
+        bucket.updated_at = now
+
+        # the token is taken right away, a negative balance means the request is scheduled in the future
+        bucket.tokens -= 1
+
+        delay = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0
+
+        return max(delay, bucket.blocked_until - now)
+
+    def report(self, host: str, status_code: int, retry_after: Optional[str] = None):
+        """ Adapts the rate of the host to the status code of its latest response. """
+        bucket = self._get_bucket(host)
+
+        if status_code in BACKOFF_STATUS_CODES:
+            bucket.healthy_responses = 0
+            bucket.rate = max(bucket.max_rate * self.MIN_RATE_FACTOR, bucket.rate / 2)
+
+            pause = parse_retry_after(retry_after)
+
+            if pause:
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + pause)
+
+            logger.warning(f"Host {host} answered with {status_code}, slowing down to {bucket.rate:.2f} requests/s (Retry-After: {pause:.0f}s)")
+            return
+
+        if bucket.rate >= bucket.max_rate:
+            return
+
+        bucket.healthy_responses += 1
+
+        if bucket.healthy_responses >= self.RECOVERY_RESPONSES:
+            bucket.healthy_responses = 0
+            bucket.rate = min(bucket.max_rate, bucket.rate * 2)
+            logger.info(f"Host {host} is healthy again, speeding up to {bucket.rate:.2f} requests/s")
@@ -1,49 +1,254 @@
-"""This module holds functions to find and parse sitemap.xml files from a given website and return the found urls."""
+"""This module holds functions to find and parse sitemap.xml files from a given website and return the found urls.
+Sitemaps are parsed incrementally while they are downloaded and the urls are yielded as soon as they are found, so the
+crawl can start before all sitemaps are read and memory stays flat even for very large sitemaps."""
 
-import requests
+from typing import Iterable, Iterator, List, Union
+
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import XMLPullParser
 
+import requests
 from loguru import logger
-from bs4 import BeautifulSoup
 
+from src.data_objects import LinkStatus, SitemapEntry
+from src.http_client import HttpClient
+
+
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+
+CHUNK_SIZE = 64 * 1024
+
+# the number of urls buffered between the sitemap readers and the crawl
+URL_BUFFER_SIZE = 1000
+
+
+def _local_name(tag: str) -> str:
+    """ Strips the xml namespace from a tag, e.g. {http://www.sitemaps.org/schemas/sitemap/0.9}loc -> loc """
+    return tag.rsplit("}", 1)[-1]
+
+
+def _decompress(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """ Passes the chunks through, unless the data is gzip compressed. Then it is decompressed in bounded pieces. """
+    decompressor = None
+    first_chunk = True
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+
+        if first_chunk:
+            first_chunk = False
+
+            if chunk.startswith(GZIP_MAGIC_NUMBER):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if decompressor is None:
+            yield chunk
+            continue
+
+        while chunk:
+            yield decompressor.decompress(chunk, CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
+
+    if decompressor:
+        yield decompressor.flush()
+
+
+def parse_sitemapt_xml(sitemap_xml: Union[bytes, Iterable[bytes]]) -> Iterator[SitemapEntry]:
+    """ Incrementally parses a sitemap or sitemap index and yields its entries while the data is still coming in.
+    :param sitemap_xml: the sitemap as bytes or an iterable of byte chunks, gzip compressed sitemaps (.xml.gz) are detected automatically
+    """
+    if isinstance(sitemap_xml, bytes):
+        sitemap_xml = [sitemap_xml]
+
+    parser = XMLPullParser(events=("start", "end"))
+    root = None
+
+    def read_entries():
+        nonlocal root
+
+        for event, element in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+
+            tag = _local_name(element.tag)
+
+            if tag not in ("url", "sitemap"):
+                continue
+
+            values = {_local_name(child.tag): child.text.strip() for child in element if child.text}
+
+            if values.get("loc"):
+                yield SitemapEntry(loc=values["loc"], is_sitemap=tag == "sitemap", lastmod=values.get("lastmod"))
+
+            # drop the already processed entries so that the tree does not grow with the sitemap
+            root.clear()
+
+    for chunk in _decompress(sitemap_xml):
+        parser.feed(chunk)
+        yield from read_entries()
+
+    parser.close()
+    yield from read_entries()
 
-def parse_sitemapt_xml(sitemap_xml):
-    soup = BeautifulSoup(sitemap_xml, features="xml")
 
-    urls = soup.find_all('loc')
+def get_robots_sitemaps(url, http_client: HttpClient) -> List[str]:
+    """ Returns the sitemap urls listed with "Sitemap:" lines in the robots.txt of the given website. """
+    response = http_client.get(url + '/robots.txt', stream=True)
 
-    return [url.text for url in urls]
+    if response.status_code != 200:
+        response.close()
+        return []
 
-def get_sitemap_urls(url):
-    """ Try to find the sitemap.xml file(s) for the given url and return the urls found in it. 
+    robots_txt = http_client.read_body(response).decode(response.encoding or "utf-8", errors="replace")
+    sitemaps = []
+
+    for line in robots_txt.splitlines():
+        key, _, value = line.partition(":")
+
+        if key.strip().lower() == "sitemap" and value.strip():
+            sitemaps.append(value.strip())
+
+    return sitemaps
+
+
+class _SitemapReader:
+    """ Reads sitemaps in parallel worker threads and hands the page entries to the consumer through a bounded queue.
+    Sitemap indexes are followed recursively, every sitemap is read only once. A sitemap that can not be read does not
+    stop the others, it is handed to the consumer as an entry with the status code of the failure.
+    """
+
+    def __init__(self, http_client: HttpClient, workers: int):
+        self.http_client = http_client
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sitemap")
+
+        self.urls = queue.Queue(maxsize=URL_BUFFER_SIZE)
+        self.stopped = threading.Event()
+
+        self._lock = threading.Lock()
+        self._seen_sitemaps = set()
+        self._running_readers = 0
+
+    def submit(self, sitemap_url: str, is_sub_sitemap: bool, response=None) -> bool:
+        """ Schedules reading the given sitemap.
+        :param is_sub_sitemap: sub sitemaps listed in a sitemap index have to exist
+        :param response: an already opened streamed response of the sitemap
+        """
+        with self._lock:
+            if sitemap_url in self._seen_sitemaps:
+                return False
+
+            self._seen_sitemaps.add(sitemap_url)
+            self._running_readers += 1
+
+        self.executor.submit(self._read, sitemap_url, is_sub_sitemap, response)
+        return True
+
+    def _put(self, item) -> bool:
+        # wait for the consumer, but give up if it stopped reading
+        while not self.stopped.is_set():
+            try:
+                self.urls.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _read(self, sitemap_url: str, is_sub_sitemap: bool, response):
+        try:
+            if response is None:
+                response = self.http_client.get(sitemap_url, stream=True)
+
+            with response:
+                if response.status_code != 200:
+                    # a sub sitemap listed in a sitemap index should always exist, this indicates more substantial problems with the website
+                    logger.error(f"The {'sub ' if is_sub_sitemap else ''}sitemap {sitemap_url} could not be loaded: {response.status_code}")
+                    self._put(("entry", SitemapEntry(loc=sitemap_url, is_sitemap=True, status_code=response.status_code)))
+                    return
+
+                logger.info(f"Reading sitemap: {sitemap_url}")
+
+                for entry in parse_sitemapt_xml(response.iter_content(CHUNK_SIZE)):
+                    if entry.is_sitemap:
+                        self.submit(entry.loc, is_sub_sitemap=True)
+
+                    elif not self._put(("entry", entry)):
+                        return
+
+        except Exception as e:
+            # e.g. a timeout or a sitemap that is no xml, the entries read so far are kept
+            logger.error(f"The sitemap {sitemap_url} could not be read: {e}")
+            self._put(("entry", SitemapEntry(loc=sitemap_url, is_sitemap=True, status_code=LinkStatus.ERROR)))
+
+        finally:
+            self._put(("done", sitemap_url))
+
+    def __iter__(self) -> Iterator[SitemapEntry]:
+        try:
+            while True:
+                with self._lock:
+                    if self._running_readers == 0 and self.urls.empty():
+                        return
+
+                kind, value = self.urls.get()
+
+                if kind == "entry":
+                    yield value
+
+                else:
+                    with self._lock:
+                        self._running_readers -= 1
+
+        finally:
+            self.stopped.set()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_sitemap_urls(url, http_client: HttpClient, workers: int = 4) -> Iterator[SitemapEntry]:
+    """ Try to find the sitemap.xml file(s) for the given url and yield the page entries found in it, i.e. the url and lastmod of each page.
+    The sitemaps listed in robots.txt are used, if there are none /sitemap.xml and /sitemap-index.xml are tried.
+    Sitemaps that can not be read are yielded as entries with is_sitemap and their status_code set.
+    Nested sitemap indexes are followed and sub sitemaps are read in parallel.
     :param url: The main url of the website without any slash or sub path at the end e.g. https://www.google.com.
+    :param http_client: The shared http client used for all requests.
+    :param workers: The number of sitemaps that are read in parallel.
     """
+    reader = _SitemapReader(http_client, workers)
+
+    try:
+        robots_sitemaps = get_robots_sitemaps(url, http_client)
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"The robots.txt of {url} could not be read: {e}")
+        robots_sitemaps = []
 
-    # try the most common location for sitemap.xml first
-    sitemap_url = url + '/sitemap.xml'
+    if robots_sitemaps:
+        logger.info(f"Found sitemaps in robots.txt: {robots_sitemaps}")
 
-    response = requests.get(sitemap_url)
+        for sitemap_url in robots_sitemaps:
+            reader.submit(sitemap_url, is_sub_sitemap=False)
 
-    if response.status_code == 200:
-        return parse_sitemapt_xml(response.content)
-    
-    # if sitemap.xml is not found, try sitemap-index.xml
-    # and parse the sitemap urls from there for sub sitemap (sitempa-0.xml, sitemap-1.xml, etc.)
-    sitemap_urls = []
+    else:
+        # try the most common location for sitemap.xml first, then sitemap-index.xml
+        for sitemap_url in [url + '/sitemap.xml', url + '/sitemap-index.xml']:
+            try:
+                response = http_client.get(sitemap_url, stream=True)
 
-    sitemap_index_url = url + '/sitemap-index.xml'
+            except requests.exceptions.RequestException as e:
+                logger.error(f"The sitemap {sitemap_url} could not be loaded: {e}")
+                continue
 
-    response = requests.get(sitemap_index_url)
-    
-    if response.status_code == 200:
-        sub_sitemaps_urls = parse_sitemapt_xml(response.content)
-    
-        for sitemap_url in sub_sitemaps_urls:
-            response = requests.get(sitemap_url)
+            # websites without a sitemap often answer with an html page (soft 404) instead of a 404
+            if response.status_code == 200 and "html" not in response.headers.get("Content-Type", ""):
+                reader.submit(sitemap_url, is_sub_sitemap=False, response=response)
+                break
 
-            if response.status_code == 404:
-                # This should never happen and indicates more substantial problems with the website
-                raise Exception(f"The sub sitemap {sitemap_url} which was fetched from sitemap-index.xml could not be found!")
-            
-            sitemap_urls.extend(parse_sitemapt_xml(response.content))
+            response.close()
 
-    return sitemap_urls
+    yield from reader
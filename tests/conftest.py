@@ -0,0 +1,63 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, so that the tests can see whether connections are reused
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _respond(self):
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+            self.server.request_headers.append(self.headers)
+
+        # a route is either specific to the method, e.g. ("HEAD", "/page"), or applies to all methods
+        status, headers, body = self.server.routes.get((self.command, self.path)) or self.server.routes.get(self.path) or (404, {}, b"not found")
+
+        self.send_response(status)
+
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = _respond
+    do_HEAD = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    """ A local http server answering with the (status, headers, body) of its routes. It counts the connections opened
+    to it and records the requests it received and their headers.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    server.request_headers = []
+    server.routes = {}
+    server.url = lambda path: f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
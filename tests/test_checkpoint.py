@@ -0,0 +1,61 @@
+import pytest
+
+from src.checkpoint import CrawlCheckpoint
+from src.data_objects import LinkCategory, LinkType
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return tmp_path.joinpath("checkpoints", "www.example.com.jsonl")
+
+
+def write_checkpoint(checkpoint_path):
+    checkpoint = CrawlCheckpoint(checkpoint_path, "https://www.example.com/")
+    checkpoint.open(resume=False)
+    checkpoint.add_page("https://www.example.com/", 200, [("/a", LinkType.LINK), ("/b.png", LinkType.IMAGE)], ["top"], depth=0)
+    checkpoint.add_result("https://www.example.com/a", 404, LinkCategory.BROKEN)
+    checkpoint.close()
+
+
+def test_load_written_events(checkpoint_path):
+    write_checkpoint(checkpoint_path)
+
+    state = CrawlCheckpoint(checkpoint_path, "https://www.example.com/").load()
+
+    assert state.pages == {"https://www.example.com/": (200, [("/a", LinkType.LINK), ("/b.png", LinkType.IMAGE)], ["top"], 0)}
+    assert state.results == {"https://www.example.com/a": (404, LinkCategory.BROKEN)}
+
+
+def test_resume_appends_to_the_checkpoint(checkpoint_path):
+    write_checkpoint(checkpoint_path)
+
+    checkpoint = CrawlCheckpoint(checkpoint_path, "https://www.example.com/")
+    checkpoint.open(resume=True)
+    checkpoint.add_result("https://www.example.com/b.png", 200, LinkCategory.WORKING)
+    checkpoint.close()
+
+    assert len(checkpoint.load().results) == 2
+
+
+def test_incomplete_last_line_is_ignored(checkpoint_path):
+    write_checkpoint(checkpoint_path)
+
+    with open(checkpoint_path, "a") as file:
+        file.write('{"r":"https://www.example.com/b.png","s":2')
+
+    assert list(CrawlCheckpoint(checkpoint_path, "https://www.example.com/").load().results) == ["https://www.example.com/a"]
+
+
+def test_checkpoint_of_another_website_is_not_resumed(checkpoint_path):
+    write_checkpoint(checkpoint_path)
+
+    assert CrawlCheckpoint(checkpoint_path, "https://www.example.org/").load() is None
+    assert CrawlCheckpoint(checkpoint_path.with_name("missing.jsonl"), "https://www.example.com/").load() is None
+
+
+def test_finished_crawl_removes_its_checkpoint(checkpoint_path):
+    checkpoint = CrawlCheckpoint(checkpoint_path, "https://www.example.com/")
+    checkpoint.open(resume=False)
+    checkpoint.close(remove=True)
+
+    assert not checkpoint_path.exists()
@@ -0,0 +1,101 @@
+import pytest
+
+from src import circuit_breaker
+from src.circuit_breaker import CircuitState, HostCircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ Replaces the monotonic clock of the circuit breaker with one that only moves when told to. """
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def open_circuit(breaker: HostCircuitBreaker, host="down.example.com"):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(host)
+
+
+def test_opens_after_failures_in_a_row(clock):
+    breaker = HostCircuitBreaker(failure_threshold=3, reset_timeout=60)
+
+    breaker.record_failure("down.example.com")
+    breaker.record_failure("down.example.com")
+    assert breaker.allow("down.example.com")
+
+    breaker.record_failure("down.example.com")
+    assert breaker.state("down.example.com") == CircuitState.OPEN
+    assert not breaker.allow("down.example.com")
+    assert breaker.allow("up.example.com")
+
+
+def test_success_resets_the_failures(clock):
+    breaker = HostCircuitBreaker(failure_threshold=2)
+
+    breaker.record_failure("flaky.example.com")
+    breaker.record_success("flaky.example.com")
+    breaker.record_failure("flaky.example.com")
+
+    assert breaker.state("flaky.example.com") == CircuitState.CLOSED
+
+
+def test_single_trial_request_after_reset_timeout(clock):
+    breaker = HostCircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_circuit(breaker)
+
+    clock[0] += 59
+    assert not breaker.allow("down.example.com")
+
+    clock[0] += 1
+    assert breaker.allow("down.example.com")
+    assert breaker.state("down.example.com") == CircuitState.HALF_OPEN
+    # only one trial request at a time
+    assert not breaker.allow("down.example.com")
+
+
+def test_failed_trial_opens_the_circuit_again(clock):
+    breaker = HostCircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_circuit(breaker)
+    clock[0] += 60
+    assert breaker.allow("down.example.com")
+
+    breaker.record_failure("down.example.com")
+    assert breaker.state("down.example.com") == CircuitState.OPEN
+    assert not breaker.allow("down.example.com")
+
+    clock[0] += 60
+    assert breaker.allow("down.example.com")
+
+
+def test_successful_trial_closes_the_circuit(clock):
+    breaker = HostCircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_circuit(breaker)
+    clock[0] += 60
+    assert breaker.allow("down.example.com")
+
+    breaker.record_success("down.example.com")
+    assert breaker.state("down.example.com") == CircuitState.CLOSED
+    assert breaker.allow("down.example.com")
+    assert breaker.allow("down.example.com")
+
+
+def test_released_trial_lets_the_next_request_through(clock):
+    breaker = HostCircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_circuit(breaker)
+    clock[0] += 60
+    assert breaker.allow("down.example.com")
+
+    # e.g. the trial request was cancelled
+    breaker.release_trial("down.example.com")
+    assert breaker.state("down.example.com") == CircuitState.HALF_OPEN
+    assert breaker.allow("down.example.com")
+
+
+def test_zero_threshold_disables_the_breaker(clock):
+    breaker = HostCircuitBreaker(failure_threshold=0)
+
+    for _ in range(10):
+        breaker.record_failure("down.example.com")
+
+    assert breaker.allow("down.example.com")
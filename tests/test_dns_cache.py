@@ -0,0 +1,72 @@
+import socket
+
+import pytest
+
+from src import dns_cache
+from src.dns_cache import DnsCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ Replaces the monotonic clock of the DNS cache with one that only moves when told to. """
+    now = [1000.0]
+    monkeypatch.setattr(dns_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache():
+    cache = DnsCache(ttl=300, negative_ttl=30)
+    cache.resolved_hosts = []
+
+    def resolve(host, port, family=0, type=0, proto=0, flags=0):
+        cache.resolved_hosts.append(host)
+
+        if host.endswith(".invalid"):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("192.0.2.1", port))]
+
+    cache._resolve = resolve
+    return cache
+
+
+def test_resolved_addresses_are_reused_until_they_expire(cache, clock):
+    addresses = cache.getaddrinfo("www.example.com", 443)
+
+    assert cache.getaddrinfo("www.example.com", 443) == addresses
+    assert cache.resolved_hosts == ["www.example.com"]
+
+    clock[0] += 301
+    cache.getaddrinfo("www.example.com", 443)
+    assert cache.resolved_hosts == ["www.example.com"] * 2
+    assert (cache.lookups, cache.hits) == (3, 1)
+
+
+def test_failed_lookups_are_cached_shorter(cache, clock):
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            cache.getaddrinfo("nohost.invalid", 80)
+
+    assert cache.resolved_hosts == ["nohost.invalid"]
+
+    clock[0] += 31
+
+    with pytest.raises(socket.gaierror):
+        cache.getaddrinfo("nohost.invalid", 80)
+
+    assert cache.resolved_hosts == ["nohost.invalid"] * 2
+
+
+def test_install_and_uninstall():
+    original_getaddrinfo = socket.getaddrinfo
+    cache = DnsCache()
+
+    cache.install()
+
+    try:
+        assert socket.getaddrinfo == cache.getaddrinfo
+    finally:
+        cache.uninstall()
+
+    assert socket.getaddrinfo is original_getaddrinfo
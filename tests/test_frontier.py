@@ -0,0 +1,77 @@
+from src.frontier import CrawlFrontier, VisitedSet
+
+
+def test_visited_set_keeps_members_when_switching_to_bloom_filter():
+    visited = VisitedSet(capacity=1000, error_rate=0.001, exact_limit=10)
+    urls = [f"https://www.example.com/page-{index}/" for index in range(50)]
+
+    for url in urls[:10]:
+        visited.add(url)
+
+    assert visited.is_exact
+
+    for url in urls[10:]:
+        visited.add(url)
+
+    assert not visited.is_exact
+    assert len(visited) == 50
+    # a Bloom filter never forgets a member
+    assert all(url in visited for url in urls)
+
+
+def test_visited_set_bloom_filter_false_positive_rate():
+    visited = VisitedSet(capacity=10_000, error_rate=0.01, exact_limit=0)
+
+    for index in range(10_000):
+        visited.add(f"https://www.example.com/visited-{index}/")
+
+    false_positives = sum(f"https://www.example.com/new-{index}/" in visited for index in range(10_000))
+    # generous bound, the expected rate at capacity is 1%
+    assert false_positives < 300
+
+
+def test_frontier_is_breadth_first_and_deduplicated():
+    frontier = CrawlFrontier(max_depth=5, max_pages=100)
+
+    assert frontier.add("https://www.example.com/a", 1)
+    assert frontier.add("https://www.example.com/b", 2)
+    assert not frontier.add("https://www.example.com/a", 3)
+
+    assert frontier.pop() == ("https://www.example.com/a", 1)
+    assert frontier.pop() == ("https://www.example.com/b", 2)
+    assert frontier.pop() is None
+
+
+def test_frontier_limits():
+    frontier = CrawlFrontier(max_depth=2, max_pages=2)
+
+    assert not frontier.add("https://www.example.com/deep", 3)
+    assert frontier.visit("https://www.example.com/")
+    assert not frontier.visit("https://www.example.com/")
+    assert frontier.add("https://www.example.com/a", 1)
+    assert not frontier.add("https://www.example.com/b", 1)
+
+    assert frontier.dropped == 1
+    assert len(frontier) == 1
+
+
+def test_frontier_counts_each_dropped_page_once():
+    frontier = CrawlFrontier(max_depth=5, max_pages=1)
+
+    assert frontier.add("https://www.example.com/a", 1)
+
+    for _ in range(3):
+        assert not frontier.add("https://www.example.com/b", 1)
+        assert not frontier.add("https://www.example.com/c", 2)
+
+    assert frontier.dropped == 2
+
+
+def test_visited_set_bloom_filter_is_sized_for_the_urls_it_takes_over():
+    visited = VisitedSet(capacity=10, error_rate=0.001, exact_limit=1000)
+
+    for index in range(1001):
+        visited.add(f"https://www.example.com/visited-{index}/")
+
+    assert not visited.is_exact
+    assert sum(f"https://www.example.com/new-{index}/" in visited for index in range(1000)) < 20
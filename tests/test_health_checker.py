@@ -0,0 +1,194 @@
+import asyncio
+
+import pytest
+import requests
+from urllib3.exceptions import LocationParseError
+
+from src import health_checker
+from src.checkpoint import CheckpointState
+from src.data_objects import LinkCategory, LinkStatus, LinkType
+from src.health_checker import WebsiteHealthChecker
+from src.link_prober import ProbeResult
+from src.page_store import PageStore
+
+
+@pytest.fixture
+def checker(tmp_path):
+    checker = WebsiteHealthChecker("https://www.example.com/", config={
+        "checkpoint_path": str(tmp_path.joinpath("checkpoint.jsonl")),
+        "cache_path": str(tmp_path.joinpath("link_cache.sqlite3")),
+        "host_rate_limit": 1000
+    })
+    yield checker
+    checker.link_cache.close()
+    checker.http_client.close()
+
+
+def check_links(checker: WebsiteHealthChecker, links):
+    async def run():
+        checker._request_slots = asyncio.Semaphore(checker.concurrency)
+
+        for link in links:
+            checker._check_link_health("https://www.example.com/", link, LinkType.LINK)
+
+        await checker._wait_for_link_checks()
+
+    asyncio.run(run())
+
+
+def test_unparsable_host_is_reported_as_broken(checker, monkeypatch):
+    def probe(link, resource_type, cached_result):
+        raise LocationParseError("'www..example.com', label empty or too long")
+
+    monkeypatch.setattr(checker.link_prober, "probe", probe)
+
+    check_links(checker, ["https://other.example.com/"])
+
+    record = checker.link_registry.get("https://other.example.com/")
+    assert record.category == LinkCategory.BROKEN
+    assert record.status_code == LinkStatus.ERROR
+
+
+def test_unexpected_error_of_one_link_does_not_abort_the_checks(checker, monkeypatch):
+    async def check_link(link_record):
+        if link_record.link.endswith("/fails"):
+            raise RuntimeError("unexpected")
+
+        checker._finish_link_check(link_record, LinkCategory.WORKING)
+
+    monkeypatch.setattr(checker, "_check_link", check_link)
+
+    check_links(checker, ["https://www.example.com/fails", "https://www.example.com/works"])
+
+    assert checker.link_registry.get("https://www.example.com/fails").category == LinkCategory.BROKEN
+    assert checker.link_registry.get("https://www.example.com/works").category == LinkCategory.WORKING
+    assert not checker._link_tasks
+
+
+def test_page_that_fails_to_parse_is_skipped(checker, monkeypatch):
+    original_parse_page = health_checker.parse_page
+
+    def parse_page(content, encoding):
+        if content == b"broken":
+            raise ValueError("unexpected")
+
+        return original_parse_page(content, encoding)
+
+    monkeypatch.setattr(health_checker, "parse_page", parse_page)
+
+    async def run():
+        pages, parsed_pages = asyncio.Queue(), asyncio.Queue()
+
+        for page in [("https://www.example.com/a", 0, "2024-05-01", b"broken", None),
+                     ("https://www.example.com/b", 0, "2024-05-01", b'<a href="/c">c</a>', None), None]:
+            pages.put_nowait(page)
+
+        await checker._parse_pages(pages, parsed_pages, None)
+        return [parsed_pages.get_nowait() for _ in range(parsed_pages.qsize())]
+
+    (failed_url, _, failed_lastmod, failed_page), (url, _, _, page) = asyncio.run(run())
+
+    assert (failed_url, failed_lastmod, failed_page.links) == ("https://www.example.com/a", None, [])
+    assert url == "https://www.example.com/b"
+    assert page.links == [("/c", LinkType.LINK)]
+
+
+def test_not_modified_link_keeps_its_cached_result(checker, monkeypatch):
+    cached_result = ProbeResult(status_code=200, redirect_status_code=301, final_url="https://other.example.com/new", method="GET", etag='"v1"')
+    checker.link_cache.store("https://other.example.com/", cached_result)
+    previous_results = []
+
+    def probe(link, resource_type, previous_result):
+        previous_results.append(previous_result)
+        return ProbeResult(status_code=304, redirect_status_code=None, final_url=link, method="HEAD")
+
+    monkeypatch.setattr(checker.link_prober, "probe", probe)
+
+    check_links(checker, ["https://other.example.com/"])
+
+    # the expired cache entry is revalidated with its validators
+    assert previous_results[0].etag == '"v1"'
+    record = checker.link_registry.get("https://other.example.com/")
+    assert (record.category, record.status_code) == (LinkCategory.REDIRECTED, 301)
+
+
+def test_rate_limited_link_is_retried(checker, monkeypatch):
+    status_codes = [429, 200]
+
+    def probe(link, resource_type, previous_result):
+        return ProbeResult(status_code=status_codes.pop(0), redirect_status_code=None, final_url=link, method="HEAD")
+
+    monkeypatch.setattr(checker.link_prober, "probe", probe)
+
+    check_links(checker, ["https://other.example.com/"])
+
+    assert not status_codes
+    assert checker.link_registry.get("https://other.example.com/").category == LinkCategory.WORKING
+    assert checker.rate_limiter.buckets["other.example.com"].rate < 1000
+
+
+def test_resume_only_checks_the_pending_links(checker, monkeypatch):
+    state = CheckpointState(
+        pages={"https://www.example.com/": (200, [("/checked", LinkType.LINK), ("/pending", LinkType.LINK)], [], 0)},
+        results={"https://www.example.com/checked": (404, LinkCategory.BROKEN)}
+    )
+    probed_links = []
+
+    def probe(link, resource_type, previous_result):
+        probed_links.append(link)
+        return ProbeResult(status_code=200, redirect_status_code=None, final_url=link, method="HEAD")
+
+    monkeypatch.setattr(checker.link_prober, "probe", probe)
+
+    async def run():
+        checker._request_slots = asyncio.Semaphore(checker.concurrency)
+        checker._resume_from_checkpoint(state)
+        await checker._wait_for_link_checks()
+
+    asyncio.run(run())
+
+    assert probed_links == ["https://www.example.com/pending"]
+    assert checker.link_registry.get("https://www.example.com/checked").category == LinkCategory.BROKEN
+    assert checker.link_registry.get("https://www.example.com/pending").category == LinkCategory.WORKING
+
+
+def test_links_of_a_down_host_are_not_requested(checker, monkeypatch):
+    probed_links = []
+
+    def probe(link, resource_type, previous_result):
+        probed_links.append(link)
+        raise requests.exceptions.ConnectionError("connection refused")
+
+    monkeypatch.setattr(checker.link_prober, "probe", probe)
+    checker.circuit_breaker.failure_threshold = 2
+    checker.concurrency = 1
+
+    check_links(checker, [f"https://down.example.com/{index}" for index in range(4)])
+
+    assert len(probed_links) == 2
+    status_codes = [checker.link_registry.get(f"https://down.example.com/{index}").status_code for index in range(4)]
+    assert status_codes == [LinkStatus.ERROR] * 2 + [LinkStatus.HOST_DOWN] * 2
+
+
+def test_unchanged_sitemap_page_reuses_its_stored_links(checker, tmp_path, monkeypatch):
+    checker.page_store = PageStore(tmp_path.joinpath("page_store.sqlite3"))
+    checker.page_store.store_page(checker.site_name, "https://www.example.com/a", "2024-05-01", [("/b", LinkType.LINK)], [])
+
+    def probe(link, resource_type, previous_result):
+        return ProbeResult(status_code=200, redirect_status_code=None, final_url=link, method="HEAD")
+
+    monkeypatch.setattr(checker.link_prober, "probe", probe)
+
+    async def run():
+        checker._request_slots = asyncio.Semaphore(checker.concurrency)
+        reused = [checker._reuse_page("https://www.example.com/a", "2024-05-01"), checker._reuse_page("https://www.example.com/a", "2024-06-01")]
+        await checker._wait_for_link_checks()
+        return reused
+
+    try:
+        assert asyncio.run(run()) == [True, False]
+    finally:
+        checker.page_store.close()
+
+    assert checker.reused_pages == 1
+    assert checker.link_registry.get("https://www.example.com/b").category == LinkCategory.WORKING
@@ -0,0 +1,49 @@
+import pytest
+
+from src.http_client import HttpClient
+
+
+@pytest.fixture
+def http_client():
+    http_client = HttpClient()
+    yield http_client
+    http_client.close()
+
+
+def test_statistics_count_reused_connections(local_server, http_client):
+    local_server.routes["/page"] = (200, {}, b"<html></html>")
+
+    for _ in range(4):
+        http_client.get(local_server.url("/page"))
+
+    statistics = http_client.get_statistics()
+    assert (statistics.requests, statistics.connections_opened) == (4, local_server.connections) == (4, 1)
+    assert statistics.reuse_rate == 0.75
+
+
+def test_statistics_count_reconnects_of_dropped_connections(local_server, http_client):
+    local_server.routes["/page"] = (200, {}, b"<html></html>" * 100)
+
+    for _ in range(3):
+        # closing an unread streamed response drops its connection, the pooled connection object reconnects
+        http_client.get(local_server.url("/page"), stream=True).close()
+
+    statistics = http_client.get_statistics()
+    assert statistics.connections_opened == local_server.connections == 3
+    assert statistics.reuse_rate == 0
+
+
+def test_streamed_response_holds_its_connection_slot(local_server):
+    local_server.routes["/page"] = (200, {}, b"<html></html>")
+    http_client = HttpClient(max_connections=1)
+
+    try:
+        response = http_client.get(local_server.url("/page"), stream=True)
+        assert not http_client._connection_slots.acquire(blocking=False)
+
+        response.close()
+        response.close()
+        assert http_client._connection_slots.acquire(blocking=False)
+
+    finally:
+        http_client.close()
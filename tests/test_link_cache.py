@@ -0,0 +1,61 @@
+import pytest
+
+from src import link_cache
+from src.data_objects import LinkType
+from src.link_cache import LinkCache
+from src.link_prober import ProbeResult
+
+
+def probe_result(status_code, etag=None):
+    return ProbeResult(status_code=status_code, redirect_status_code=None, final_url="https://www.example.com/", method="HEAD", etag=etag)
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path.joinpath("cache", "link_cache.sqlite3")
+
+
+def test_results_are_kept_across_runs(cache_path):
+    cache = LinkCache(cache_path)
+    cache.store("https://www.example.com/", probe_result(200, etag='"v1"'))
+    cache.close()
+
+    cache = LinkCache(cache_path)
+    result, checked_at = cache.get("https://www.example.com/")
+    cache.close()
+
+    assert (result.status_code, result.etag, result.method) == (200, '"v1"', "CACHE")
+    assert checked_at > 0
+
+
+def test_unknown_url(cache_path):
+    cache = LinkCache(cache_path)
+    assert cache.get("https://www.example.com/unknown") is None
+    cache.close()
+
+
+def test_results_of_overloaded_or_failing_servers_are_not_stored(cache_path):
+    cache = LinkCache(cache_path)
+
+    for status_code in (429, 500, 503):
+        cache.store(f"https://www.example.com/{status_code}", probe_result(status_code))
+
+    cache.store("https://www.example.com/404", probe_result(404))
+
+    assert [cache.get(f"https://www.example.com/{status_code}") is not None for status_code in (429, 500, 503, 404)] == [False, False, False, True]
+    cache.close()
+
+
+def test_ttl_of_domains_and_link_types(cache_path, monkeypatch):
+    cache = LinkCache(cache_path, ttl={"default": 60, "Image": 3600}, domain_ttl={"example.org": 0})
+
+    assert cache.get_ttl("https://www.example.com/", LinkType.LINK) == 60
+    assert cache.get_ttl("https://www.example.com/a.png", LinkType.IMAGE) == 3600
+    # domains take precedence and match their subdomains
+    assert cache.get_ttl("https://cdn.example.org/a.png", LinkType.IMAGE) == 0
+
+    monkeypatch.setattr(link_cache.time, "time", lambda: 1000.0)
+    assert cache.is_fresh("https://www.example.com/", LinkType.LINK, checked_at=950.0)
+    assert not cache.is_fresh("https://www.example.com/", LinkType.LINK, checked_at=900.0)
+    assert not cache.is_fresh("https://cdn.example.org/a.png", LinkType.IMAGE, checked_at=1000.0)
+    cache.close()
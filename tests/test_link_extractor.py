@@ -0,0 +1,79 @@
+from src.data_objects import LinkType
+from src.link_extractor import detect_encoding, parse_css_urls, parse_page, parse_srcset
+
+
+def test_parse_srcset():
+    assert parse_srcset("a.png 1x, b.png 2x") == ["a.png", "b.png"]
+    assert parse_srcset("small.jpg 300w,large.jpg 1000w") == ["small.jpg", "large.jpg"]
+    assert parse_srcset("a.png, b.png") == ["a.png", "b.png"]
+    assert parse_srcset("  ") == []
+    # commas inside a url are part of the url
+    assert parse_srcset("data:image/png;base64,AAA 1x, b.png 2x") == ["data:image/png;base64,AAA", "b.png"]
+
+
+def test_parse_css_urls():
+    css = """body { background: url('/bg.png') } @font-face { src: url("font.woff2"), url( icons.svg ) } a { background: url() }"""
+    assert parse_css_urls(css) == ["/bg.png", "font.woff2", "icons.svg"]
+
+
+def test_parse_page_links_and_anchors():
+    html = b"""<html><head><link rel="stylesheet" href="/style.css"><script src="/app.js"></script>
+        <style>.hero { background: url(/hero.jpg) }</style></head>
+        <body><h1 id="top">Title</h1><a name="legacy"></a><a href="/about">About</a>
+        <img src="/a.png" srcset="/a.png 1x, /a2.png 2x"><iframe src="/frame"></iframe>
+        <video src="/movie.mp4" poster="/poster.jpg"><track src="/subs.vtt"></video>
+        <div style="background-image: url('/div.png')"></div></body></html>"""
+
+    page = parse_page(html)
+
+    assert page.links == [
+        ("/style.css", LinkType.OTHER_LINK),
+        ("/app.js", LinkType.SCRIPT),
+        ("/hero.jpg", LinkType.OTHER_LINK),
+        ("/about", LinkType.LINK),
+        ("/a.png", LinkType.IMAGE),
+        ("/a.png", LinkType.IMAGE),
+        ("/a2.png", LinkType.IMAGE),
+        ("/frame", LinkType.FRAME),
+        ("/movie.mp4", LinkType.MEDIA),
+        ("/poster.jpg", LinkType.IMAGE),
+        ("/subs.vtt", LinkType.MEDIA),
+        ("/div.png", LinkType.OTHER_LINK),
+    ]
+    assert page.anchors == ["top", "legacy"]
+
+
+def test_parse_page_empty_document():
+    assert parse_page(b"").links == []
+
+
+def test_parse_page_encoding():
+    html = '<html><body><a href="/über" id="größe">x</a></body></html>'
+
+    # served with a charset
+    assert parse_page(html.encode("utf-8"), "utf-8").links == [("/über", LinkType.LINK)]
+    assert parse_page(html.encode("latin-1"), "ISO-8859-1").links == [("/über", LinkType.LINK)]
+    # served without a charset, or with an unknown one
+    assert parse_page(html.encode("utf-8")).anchors == ["größe"]
+    assert parse_page(html.encode("utf-8"), "no-such-charset").anchors == ["größe"]
+    assert parse_page(html.encode("windows-1252")).links == [("/über", LinkType.LINK)]
+    # a <meta charset> is left to lxml
+    declared = '<html><head><meta charset="iso-8859-1"></head><body><a href="/über">x</a></body></html>'
+    assert parse_page(declared.encode("latin-1")).links == [("/über", LinkType.LINK)]
+
+
+def test_parse_page_charset_aliases():
+    html = '<html><body><a href="/über">x</a></body></html>'
+
+    # Python aliases libxml2 does not know are normalized
+    assert parse_page(html.encode("latin-1"), "latin_1").links == [("/über", LinkType.LINK)]
+    # charsets libxml2 does not support at all fall back to the detected encoding
+    assert parse_page(html.encode("utf-8"), "utf-8-sig").links == [("/über", LinkType.LINK)]
+    assert parse_page(html.encode("utf-8"), "mac-roman").links == [("/über", LinkType.LINK)]
+
+
+def test_detect_encoding():
+    assert detect_encoding("<p>über</p>".encode("utf-8")) == "utf-8"
+    assert detect_encoding("<p>über</p>".encode("latin-1")) == "windows-1252"
+    assert detect_encoding(b'<meta charset="utf-8"><p>x</p>') is None
+    assert detect_encoding(b"\xef\xbb\xbf<p>x</p>") is None
@@ -0,0 +1,81 @@
+import pytest
+
+from src.data_objects import LinkType
+from src.http_client import HttpClient
+from src.link_prober import LinkProber
+
+
+@pytest.fixture
+def http_client():
+    http_client = HttpClient()
+    yield http_client
+    http_client.close()
+
+
+def test_head_probes_reuse_the_connection(local_server, http_client):
+    local_server.routes["/page"] = (200, {}, b"<html></html>")
+    prober = LinkProber(http_client)
+
+    for _ in range(10):
+        assert prober.probe(local_server.url("/page"), LinkType.LINK).status_code == 200
+
+    assert local_server.requests == [("HEAD", "/page")] * 10
+    assert local_server.connections == 1
+
+
+def test_head_not_supported_falls_back_to_get(local_server, http_client):
+    local_server.routes[("HEAD", "/page")] = (405, {}, b"")
+    local_server.routes[("GET", "/page")] = (200, {}, b"<html></html>")
+    local_server.routes[("GET", "/other")] = (200, {}, b"<html></html>")
+    prober = LinkProber(http_client)
+
+    result = prober.probe(local_server.url("/page"), LinkType.LINK)
+    assert (result.status_code, result.method) == (200, "GET")
+
+    # the host is remembered, its next links are requested with GET right away
+    assert prober.probe(local_server.url("/other"), LinkType.LINK).method == "GET"
+    assert local_server.requests == [("HEAD", "/page"), ("GET", "/page"), ("GET", "/other")]
+
+
+def test_broken_head_is_confirmed_with_get(local_server, http_client):
+    local_server.routes[("HEAD", "/page")] = (404, {}, b"")
+    local_server.routes[("GET", "/page")] = (200, {}, b"<html></html>")
+    local_server.routes["/missing"] = (404, {}, b"not found")
+    prober = LinkProber(http_client)
+
+    assert prober.probe(local_server.url("/page"), LinkType.LINK).status_code == 200
+    assert prober.probe(local_server.url("/missing"), LinkType.LINK).status_code == 404
+    assert local_server.requests[-2:] == [("HEAD", "/missing"), ("GET", "/missing")]
+
+
+def test_redirect_and_strategy_per_link_type(local_server, http_client):
+    local_server.routes["/old"] = (301, {"Location": "/new"}, b"")
+    local_server.routes["/new"] = (200, {}, b"<html></html>")
+    prober = LinkProber(http_client, strategies={"Image": "get"})
+
+    result = prober.probe(local_server.url("/old"), LinkType.LINK)
+    assert (result.status_code, result.redirect_status_code, result.final_url) == (200, 301, local_server.url("/new"))
+
+    assert prober.probe(local_server.url("/new"), LinkType.IMAGE).method == "GET"
+    assert local_server.requests[-1] == ("GET", "/new")
+
+
+def test_conditional_request_with_previous_validators(local_server, http_client):
+    local_server.routes["/page"] = (200, {"ETag": '"v1"'}, b"<html></html>")
+    prober = LinkProber(http_client)
+
+    previous_result = prober.probe(local_server.url("/page"), LinkType.LINK)
+    assert previous_result.etag == '"v1"'
+
+    prober.probe(local_server.url("/page"), LinkType.LINK, previous_result)
+    assert local_server.request_headers[-1]["If-None-Match"] == '"v1"'
+
+
+def test_rate_limited_head_is_not_followed_by_get(local_server, http_client):
+    local_server.routes[("HEAD", "/page")] = (429, {"Retry-After": "30"}, b"")
+    prober = LinkProber(http_client)
+
+    result = prober.probe(local_server.url("/page"), LinkType.LINK)
+
+    assert (result.status_code, result.retry_after) == (429, "30")
+    assert local_server.requests == [("HEAD", "/page")]
@@ -0,0 +1,57 @@
+from src.data_objects import LinkCategory, LinkRecord, LinkType
+from src.link_registry import LinkRegistry, is_valid_url, normalize_url, resolve_link
+
+
+def test_resolve_link_relative_and_absolute():
+    assert resolve_link("https://example.com/blog/post", "../about") == "https://example.com/about"
+    assert resolve_link("https://example.com/blog/", "  image.png ") == "https://example.com/blog/image.png"
+    assert resolve_link("https://example.com/", "//cdn.example.com/app.js") == "https://cdn.example.com/app.js"
+    assert resolve_link("https://example.com/", "https://other.com/x") == "https://other.com/x"
+
+
+def test_resolve_link_ignored_and_opaque_schemes():
+    assert resolve_link("https://example.com/", "javascript:void(0)") is None
+    assert resolve_link("https://example.com/", "data:image/png;base64,AAAA") is None
+    assert resolve_link("https://example.com/", "") is None
+    assert resolve_link("https://example.com/", "mailto:office@example.com") == "mailto:office@example.com"
+    assert resolve_link("https://example.com/", "tel:+431234") == "tel:+431234"
+
+
+def test_resolve_link_keeps_invalid_links():
+    assert resolve_link("https://example.com/", "http://[oops") == "http://[oops"
+    assert not is_valid_url("http://[oops")
+    assert not is_valid_url("http://example.com:99999/")
+    assert is_valid_url("http://[::1]:8080/")
+
+
+def test_is_valid_url_checks_host_labels():
+    assert not is_valid_url("http://www..example.com/")
+    assert not is_valid_url(f"http://{'a' * 64}.example.com/")
+    assert not is_valid_url("http://.example.com/")
+    assert is_valid_url(f"http://{'a' * 63}.example.com/")
+    assert is_valid_url("http://www.example.com./")
+    assert is_valid_url("https://www.über.de/")
+    assert is_valid_url("mailto:office@example.com")
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.COM") == "https://example.com/"
+    assert normalize_url("http://example.com:80/a#top") == "http://example.com/a"
+    assert normalize_url("http://example.com:80/a#top", keep_fragment=True) == "http://example.com/a#top"
+    assert normalize_url("https://example.com:8443/a/") == "https://example.com:8443/a/"
+    assert normalize_url("http://[::1]:8080/x") == "http://[::1]:8080/x"
+    assert normalize_url("https://user:pw@Example.com/") == "https://user:pw@example.com/"
+    assert normalize_url("mailto:Office@Example.com") == "mailto:Office@Example.com"
+
+
+def test_normalize_url_keeps_invalid_urls():
+    assert normalize_url("http://[oops") == "http://[oops"
+    assert normalize_url("http://example.com:99999/") == "http://example.com:99999/"
+
+
+def test_registry_does_not_merge_invalid_port_into_host():
+    registry = LinkRegistry()
+    registry.add(LinkRecord(link="http://example.com/", resource_type=LinkType.LINK, status_code=200), LinkCategory.WORKING, found_in="Main URL")
+
+    assert registry.get("http://example.com:99999/") is None
+    assert registry.get("HTTP://EXAMPLE.com:80") is not None
@@ -0,0 +1,77 @@
+import pytest
+
+from src.data_objects import LinkCategory, LinkRecord, LinkType
+from src.link_registry import LinkRegistry
+from src.page_store import PageStore
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return tmp_path.joinpath("page_store.sqlite3")
+
+
+def registry_of(results):
+    registry = LinkRegistry()
+
+    for link, category in results.items():
+        registry.add(LinkRecord(link=link, resource_type=LinkType.LINK), category, found_in="https://www.example.com/")
+
+    return registry
+
+
+def test_stored_page_is_reused_while_its_lastmod_is_unchanged(database_path):
+    store = PageStore(database_path)
+    store.store_page("www.example.com", "https://www.example.com/a", "2024-05-01", [("/b", LinkType.LINK), ("/c.png", LinkType.IMAGE)], ["top"])
+    store.close()
+
+    store = PageStore(database_path)
+
+    assert store.get_page("www.example.com", "https://www.example.com/a", "2024-05-01") == ([("/b", LinkType.LINK), ("/c.png", LinkType.IMAGE)], ["top"])
+    assert store.get_page("www.example.com", "https://www.example.com/a", "2024-06-01") is None
+    assert store.get_page("www.example.org", "https://www.example.com/a", "2024-05-01") is None
+    store.close()
+
+
+def test_first_run_has_no_diff(database_path):
+    store = PageStore(database_path)
+
+    assert store.compare("www.example.com", registry_of({"https://www.example.com/": LinkCategory.WORKING})) is None
+    store.close()
+
+
+def test_diff_against_the_previous_run(database_path):
+    store = PageStore(database_path)
+    store.compare("www.example.com", registry_of({
+        "https://www.example.com/breaks": LinkCategory.WORKING,
+        "https://www.example.com/fixed": LinkCategory.BROKEN,
+        "https://www.example.com/same": LinkCategory.WORKING,
+    }))
+    store.save_results("www.example.com")
+
+    run_diff = store.compare("www.example.com", registry_of({
+        "https://www.example.com/breaks": LinkCategory.BROKEN,
+        "https://www.example.com/fixed": LinkCategory.REDIRECTED,
+        "https://www.example.com/same": LinkCategory.WORKING,
+        "https://www.example.com/new": LinkCategory.WORKING,
+        "https://www.example.com/pending": LinkCategory.PENDING,
+    }))
+    store.close()
+
+    assert [record.link for record in run_diff.newly_broken] == ["https://www.example.com/breaks"]
+    assert [record.link for record in run_diff.newly_fixed] == ["https://www.example.com/fixed"]
+    # pending links were not checked and are left out
+    assert [record.link for record in run_diff.new_links] == ["https://www.example.com/new"]
+
+
+def test_results_are_only_replaced_by_a_saved_run(database_path):
+    store = PageStore(database_path)
+    store.compare("www.example.com", registry_of({"https://www.example.com/a": LinkCategory.WORKING}))
+    store.save_results("www.example.com")
+
+    # a partial run compares but does not save its results
+    store.compare("www.example.com", registry_of({"https://www.example.com/a": LinkCategory.BROKEN}))
+
+    run_diff = store.compare("www.example.com", registry_of({"https://www.example.com/a": LinkCategory.BROKEN}))
+    store.close()
+
+    assert [record.link for record in run_diff.newly_broken] == ["https://www.example.com/a"]
@@ -0,0 +1,74 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import rate_limiter
+from src.rate_limiter import HostRateLimiter, parse_retry_after
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ Replaces the monotonic clock of the rate limiter with one that only moves when told to. """
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_per_host(clock):
+    limiter = HostRateLimiter(default_rate=2.0, host_rates={"slow.example.com": 0.5}, burst=2)
+
+    assert limiter.reserve("www.example.com") == 0
+    assert limiter.reserve("www.example.com") == 0
+    # the burst is used up, the next requests are scheduled at the rate of the host
+    assert limiter.reserve("www.example.com") == pytest.approx(0.5)
+    assert limiter.reserve("www.example.com") == pytest.approx(1.0)
+
+    # other hosts have a bucket of their own
+    assert limiter.reserve("slow.example.com") == 0
+    assert limiter.reserve("slow.example.com") == 0
+    assert limiter.reserve("slow.example.com") == pytest.approx(2.0)
+
+    clock[0] += 10
+    assert limiter.reserve("www.example.com") == 0
+
+
+def test_backoff_and_recovery(clock):
+    limiter = HostRateLimiter(default_rate=4.0)
+
+    limiter.report("www.example.com", 429)
+    limiter.report("www.example.com", 503)
+    assert limiter.buckets["www.example.com"].rate == 1.0
+
+    for _ in range(HostRateLimiter.RECOVERY_RESPONSES):
+        limiter.report("www.example.com", 200)
+
+    assert limiter.buckets["www.example.com"].rate == 2.0
+
+
+def test_rate_does_not_drop_below_minimum(clock):
+    limiter = HostRateLimiter(default_rate=1.0)
+
+    for _ in range(20):
+        limiter.report("www.example.com", 429)
+
+    assert limiter.buckets["www.example.com"].rate == HostRateLimiter.MIN_RATE_FACTOR
+
+
+def test_retry_after_pauses_the_host(clock):
+    limiter = HostRateLimiter(default_rate=10.0)
+
+    limiter.report("www.example.com", 429, retry_after="30")
+
+    assert limiter.reserve("www.example.com") == pytest.approx(30)
+    assert limiter.reserve("other.example.com") == 0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after(None) == 0
+    assert parse_retry_after("soon") == 0
+    assert parse_retry_after("-5") == 0
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(60, abs=2)
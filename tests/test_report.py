@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from src.data_objects import LinkCategory, LinkRecord, LinkType
+from src.link_registry import LinkRegistry
+from src.page_store import RunDiff
+from src.report import HtmlReportPrinter
+
+
+@pytest.fixture
+def registry():
+    registry = LinkRegistry()
+
+    for link, status_code, category in (
+        ("https://www.example.com/", 200, LinkCategory.WORKING),
+        ("https://www.example.com/slow", 200, LinkCategory.WORKING),
+        ("https://www.example.com/gone", 404, LinkCategory.BROKEN),
+    ):
+        registry.add(LinkRecord(link=link, resource_type=LinkType.LINK, status_code=status_code), category, found_in="https://www.example.com/")
+
+    return registry
+
+
+def print_report(tmp_path, registry, run_diff=None):
+    printer = HtmlReportPrinter()
+    printer.output_path = tmp_path
+
+    printer.print_report(
+        broken_links=registry.broken_links,
+        working_links=registry.working_links,
+        redirected_links=registry.redirected_links,
+        pages=registry.pages,
+        slow_links=[registry.get("https://www.example.com/slow")],
+        run_diff=run_diff
+    )
+
+    summary = json.loads(next(tmp_path.glob("*.json")).read_text())
+    records = [json.loads(line) for line in tmp_path.joinpath(summary["records_file"]).read_text().splitlines()]
+    return summary, records
+
+
+def test_records_are_written_once_with_flags(tmp_path, registry):
+    run_diff = RunDiff(previous_run=datetime(2024, 5, 1), newly_broken=[registry.get("https://www.example.com/gone")])
+
+    summary, records = print_report(tmp_path, registry, run_diff)
+
+    assert len(records) == summary["total_links"] == 3
+    by_link = {record["link"]: record for record in records}
+    assert by_link["https://www.example.com/slow"]["category"] == "working-links"
+    assert by_link["https://www.example.com/slow"]["slow"]
+    assert by_link["https://www.example.com/gone"]["change"] == "newly-broken"
+    assert by_link["https://www.example.com/"]["change"] is None
+
+
+def test_summary_marks_sections_that_are_not_counted(tmp_path, registry):
+    summary, _ = print_report(tmp_path, registry)
+
+    assert summary["sections"]["slow-links"]["count"] == 1
+    assert not summary["sections"]["slow-links"]["counted"]
+    assert summary["sections"]["working-links"]["counted"]
@@ -0,0 +1,110 @@
+import gzip
+
+from src.data_objects import LinkStatus, SitemapEntry
+from src.sitemap import get_sitemap_urls, parse_sitemapt_xml
+
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <url><loc> https://example.com/a </loc><lastmod>2024-05-01</lastmod></url>
+    <url><loc>https://example.com/b</loc></url>
+    <url><lastmod>2024-05-01</lastmod></url>
+</urlset>"""
+
+SITEMAP_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <sitemap><loc>https://example.com/sitemap-1.xml.gz</loc><lastmod>2024-05-01</lastmod></sitemap>
+    <sitemap><loc>https://example.com/sitemap-missing.xml</loc></sitemap>
+</sitemapindex>"""
+
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, body=b"", content_type="application/xml"):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.encoding = "utf-8"
+        self.url = ""
+
+    def iter_content(self, chunk_size):
+        return (self.body[position:position + chunk_size] for position in range(0, len(self.body), chunk_size))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FakeHttpClient:
+    """ Answers the urls of a dict, all other urls with a 404. """
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url, stream=False):
+        return self.responses.get(url) or FakeResponse(404, b"not found", "text/html")
+
+    def read_body(self, response):
+        return response.body
+
+
+def test_parse_sitemap_entries():
+    assert list(parse_sitemapt_xml(URLSET)) == [
+        SitemapEntry(loc="https://example.com/a", is_sitemap=False, lastmod="2024-05-01"),
+        SitemapEntry(loc="https://example.com/b", is_sitemap=False),
+    ]
+
+
+def test_parse_sitemap_index():
+    assert [(entry.loc, entry.is_sitemap) for entry in parse_sitemapt_xml(SITEMAP_INDEX)] == [
+        ("https://example.com/sitemap-1.xml.gz", True),
+        ("https://example.com/sitemap-missing.xml", True),
+    ]
+
+
+def test_parse_gzip_sitemap_in_chunks():
+    compressed = gzip.compress(URLSET)
+    chunks = [compressed[position:position + 7] for position in range(0, len(compressed), 7)]
+
+    assert [entry.loc for entry in parse_sitemapt_xml(chunks)] == ["https://example.com/a", "https://example.com/b"]
+
+
+def test_nested_sitemaps_with_missing_sub_sitemap():
+    http_client = FakeHttpClient({
+        "https://example.com/robots.txt": FakeResponse(body=b"User-agent: *\nSitemap: https://example.com/sitemap-index.xml\n", content_type="text/plain"),
+        "https://example.com/sitemap-index.xml": FakeResponse(body=SITEMAP_INDEX),
+        "https://example.com/sitemap-1.xml.gz": FakeResponse(body=gzip.compress(URLSET), content_type="application/gzip"),
+    })
+
+    entries = list(get_sitemap_urls("https://example.com", http_client, workers=2))
+
+    assert sorted(entry.loc for entry in entries if not entry.is_sitemap) == ["https://example.com/a", "https://example.com/b"]
+    assert [(entry.loc, entry.status_code) for entry in entries if entry.is_sitemap] == [("https://example.com/sitemap-missing.xml", 404)]
+
+
+def test_invalid_sitemap_is_reported_and_does_not_stop_the_others():
+    http_client = FakeHttpClient({
+        "https://example.com/robots.txt": FakeResponse(
+            body=b"Sitemap: https://example.com/broken.xml\nSitemap: https://example.com/sitemap.xml\n", content_type="text/plain"
+        ),
+        "https://example.com/broken.xml": FakeResponse(body=b"<html><body><p>Page not found</body></html>"),
+        "https://example.com/sitemap.xml": FakeResponse(body=URLSET),
+    })
+
+    entries = list(get_sitemap_urls("https://example.com", http_client, workers=2))
+
+    assert sorted(entry.loc for entry in entries if not entry.is_sitemap) == ["https://example.com/a", "https://example.com/b"]
+    assert [(entry.loc, entry.status_code) for entry in entries if entry.is_sitemap] == [("https://example.com/broken.xml", LinkStatus.ERROR)]
+
+
+def test_html_soft_404_is_no_sitemap():
+    http_client = FakeHttpClient({
+        "https://example.com/sitemap.xml": FakeResponse(body=b"<html><body>Not found</body></html>", content_type="text/html; charset=utf-8"),
+    })
+
+    assert list(get_sitemap_urls("https://example.com", http_client)) == []